@@ -0,0 +1,27 @@
+#
+#    Compile the subject term lists written by build-lists.py into one binary
+#    term database for subjects-check.py, which uses it memory-mapped instead of
+#    reading the text files into Python sets.  (See lib/termdb.py for the format.)
+#
+#    The workflow of which this is a part is described in the accompanying README.md file.
+#
+#    Usage:  python build-termdb.py subject-terms.txt childrens-terms.txt terms.db
+#
+#    Version:  0.2.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+import sys
+
+from lib import termdb
+
+if len(sys.argv) != 4:
+    print("Usage:  python build-termdb.py subject-terms.txt childrens-terms.txt terms.db")
+    sys.exit(1)
+
+terms = termdb.TermDB.from_lists(sys.argv[1], sys.argv[2])
+terms.save(sys.argv[3])
+print(f"{sys.argv[3]}: {len(terms.subjects)} subject terms, {len(terms.childrens)} children's terms")
@@ -4,6 +4,21 @@
 #
 #    Usage:  python sh-check.py --inputfile <MARC input file>  [ --list <filename> ] [ --summary <filename> ]
 #       or:  python sh-check.py --inputtable <database table> [ --list <filename> ] [ --summary <filename> ]
+#               [ --terms <term database> ]
+#               [ --subjectterms <filename> ] [ --childrensterms <filename> ] [ --cachesize N ]
+#               [ --results <filename> ]
+#
+#    The subject terms are loaded from the term database built by build-termdb.py (default terms.db).
+#    If there isn't one, they're read from the term lists built by build-lists.py (by default,
+#    subject-terms.txt and childrens-terms.txt), which is a lot slower.  If either list has changed
+#    since the term database was built, the term database is built again first.
+#
+#    Each different field is only classified once:  the result is remembered (for up to --cachesize
+#    different fields) and reused when the same field turns up again.  The hit rate is printed at the end.
+#
+#    With a MARC file, --results <filename> remembers how the fields of each record were classified
+#    (by a hash of the record's bytes), and the next run only classifies the records which are new
+#    or have changed.  The output is the same as classifying every record.
 #
 #    The database table should have columns for bibnumber, tag, indicators, and tagData.
 #    tagData is all the subfields glommed together.  You can get more information from
@@ -35,7 +50,7 @@
 #    The way I process the downloaded subject headings loses the distinction between $a terms and
 #    $x, $y and $z subdivisions.
 #
-#    Version:  0.2.0  4/10/25
+#    Version:  0.3.0  10/18/26
 #
 #    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
 #
@@ -46,9 +61,13 @@
 from collections import Counter
 import argparse
 import contextlib
+import functools
+import importlib.metadata
+import os
 import sys
 
-from lib import mymarc
+from lib import mymarc, resultstore, termdb
+from lib.termdb import strip_punctuation
 
 #######
 
@@ -56,16 +75,47 @@ from lib import mymarc
 
 ########
 
-def subjectheadinggenerator(recordgenerator):
-    # therecord is a pymarc Record
-    for index, (bibnumber, theRecord) in enumerate(recordgenerator):
-        # if you're reading from a MARC file, bibnumber
-        # will be empty.  You can set it from therecord here
-        bibnumber = index
-        for aField in theRecord.get_fields():
-            if (aField.tag in {"650", "655"} and
-                aField.indicator2 == "0"):       # this is the only case we're handling
-                yield bibnumber, aField
+# the only tags we look at, so reading a database table doesn't decode the rest
+SUBJECT_TAGS = ("650", "655")
+
+def subjectheadings(theRecord):
+    for aField in theRecord.get_fields():
+        if (aField.tag in SUBJECT_TAGS and
+            aField.indicator2 == "0"):       # this is the only case we're handling
+            yield aField
+
+# The LC subject fields of one record, classified:  (tag, indicators, subfields
+# labelled with their codes, errors) for each.  This is what --results remembers
+# about each record
+def classify_record(theRecord, classify):
+    result = []
+    for aField in subjectheadings(theRecord):
+        indicatorString = (aField.indicator1 + aField.indicator2).replace(" ", "\\")
+        result.append((aField.tag, indicatorString) + classify(tuple(aField)))
+    return tuple(result)
+
+# (record number, tag, indicators, subfields labelled with their codes, errors) for
+# each LC subject field in the file or table, classified by classify.  With a result
+# store (see lib/resultstore.py), the results for a record which hasn't changed since
+# the last run are reused instead of reading and classifying its fields again
+def classifiedfields(args, classify, store=None):
+    if store is None:
+        records = mymarc.recordgenerator(args.inputfile, args.inputtable, tags=SUBJECT_TAGS)
+        for index, (bibnumber, theRecord) in enumerate(records):
+            # if you're reading from a MARC file, bibnumber
+            # will be empty.  You can set it from therecord here
+            bibnumber = index
+            for fieldresult in classify_record(theRecord, classify):
+                yield (bibnumber,) + fieldresult
+        return
+    for bn, (raw, view) in enumerate(mymarc.readrawfromfile(args.inputfile)):
+        key = store.key(raw)
+        store.keep(key)
+        if (result := store.get(key)) is None:
+            result = classify_record(mymarc.decode(view), classify)
+            store.put(key, result)
+        for fieldresult in result:
+            yield (bn,) + fieldresult
 
 #######
 
@@ -84,17 +134,44 @@ def create_file_context(file, mode="", encoding="utf-8"):
 
 #########
 
-# Strip some punctuation from a subfield
+# The term lists which have been changed since the term database was built from them
+# (lists which don't exist don't count, so a term database can be used on its own)
+def newer_lists(dbfile, *listfiles):
+    built = os.path.getmtime(dbfile)
+    return [ f for f in listfiles if os.path.exists(f) and os.path.getmtime(f) > built ]
+
+# Classify each subfield of a field against the LC terms
 
 #########
 
-def strip_punctuation(subfield : str) -> str:
-    t = subfield.strip()
-    t = t.rstrip(',')
-    # strip trailing . unless it's an initial, like "Smith, A."
-    if len(t) > 2 and t[-3].isalnum():
-        t = t.rstrip('.')
-    return t
+# subfields is a tuple of (code, value) pairs.  Returns the subfields labelled with their
+# codes (for printString) and the list of things that change printFlag, in order:  None to
+# forgive earlier errors, or (value, errorCounter key) for a heading that isn't in the LCSH.
+# Nothing in here depends on earlier records, so the result can be cached
+def classify_field(subfields, subjectTermsSet, childrenstermsSet):
+    printString = ""
+    errors = []
+    for subfieldcode, subfieldvalue in subfields:
+        subfieldvalue =  strip_punctuation(subfieldvalue)  # strip *some* punctuation
+        printString += "$" + subfieldcode + ":" + subfieldvalue
+        if "Fictitious character" in subfieldvalue:
+            printString += "(FC) : "
+            errors.append(None)          # forgive earlier errors
+        elif subfieldcode == 'd':    # date => person from LCNAF
+            printString += "(D) : "     # D for date
+            errors.append(None)          # forgive earlier errors (presumably name)
+        elif subfieldcode in ['c', 'v', '2']:
+            printString += "(I) : "     # I for ignore
+        elif subfieldvalue in subjectTermsSet:
+            printString += "(Y) : "  # Y for yes, found
+        elif subfieldvalue in childrenstermsSet:
+            printString += "(C) : "     # C for children's subject heading
+            # this is an error because the second indicator = 1
+            errors.append((subfieldvalue, subfieldvalue+"(C)"))
+        else:
+            printString += "(N) : "
+            errors.append((subfieldvalue, subfieldvalue+"(N)"))
+    return printString, tuple(errors)
 
 #########
 
@@ -105,66 +182,80 @@ def main():
     group.add_argument("--inputtable", "-it")
     parser.add_argument("--list", "-l")
     parser.add_argument("--summary", "-s")
+    parser.add_argument("--terms", "-t", default="terms.db",
+                        help="term database built by build-termdb.py")
+    parser.add_argument("--subjectterms", default="subject-terms.txt",
+                        help="LCSH term list, if there's no term database")
+    parser.add_argument("--childrensterms", default="childrens-terms.txt",
+                        help="children's term list, if there's no term database")
+    parser.add_argument("--cachesize", type=int, default=100000,
+                        help="number of different headings to remember (0 = don't remember any)")
+    parser.add_argument("--results", default=None,
+                        help="remember the results for each record in this file and reuse them next time (MARC files only)")
     args = parser.parse_args()
 
-    recordgenerator = mymarc.recordgenerator(args.inputfile, args.inputtable)
+    if args.results and not args.inputfile:
+        parser.error("--results only works with --inputfile")
 
     listfile = args.list if args.list else sys.stdout
     summaryfile = args.summary if args.summary else sys.stdout
 
-    # Load terms for LC subject headings
-
-    subjectTermsSet = set()
-    with open("subject-terms.txt", encoding="utf-8") as subjectFile:
-        for phrase in subjectFile:
-            subjectTermsSet.add(strip_punctuation(phrase))
-
-    # Load terms for LC children's headings
-
-    childrenstermsSet = set()
-    with open("childrens-terms.txt", encoding="utf-8") as childrensFile:
-        for phrase in childrensFile:
-            childrenstermsSet.add(strip_punctuation(phrase))
+    # Load terms for LC subject headings and LC children's headings
+
+    if os.path.exists(args.terms) and (newer := newer_lists(args.terms, args.subjectterms, args.childrensterms)):
+        # the term database is out of date, so build it again (see build-termdb.py)
+        print(f"{', '.join(newer)} changed since {args.terms} was built, rebuilding it", file=sys.stderr)
+        terms = termdb.TermDB.from_lists(args.subjectterms, args.childrensterms)
+        terms.save(args.terms)
+        termfiles = (args.terms,)
+    elif os.path.exists(args.terms):
+        terms = termdb.TermDB.load(args.terms)
+        termfiles = (args.terms,)
+    else:
+        terms = termdb.TermDB.from_lists(args.subjectterms, args.childrensterms)
+        termfiles = (args.subjectterms, args.childrensterms)
+    subjectTermsSet = terms.subjects
+    childrenstermsSet = terms.childrens
+
+    # The same headings ("Fiction", "Juvenile literature" ...) turn up over and over,
+    # so remember how each different field was classified
+    @functools.lru_cache(maxsize=args.cachesize)
+    def classify(subfields):
+        return classify_field(subfields, subjectTermsSet, childrenstermsSet)
+
+    # The results for each record depend on this program and the LC terms, so if either
+    # changes, opening the store throws the old results away
+    store = None
+    if args.results:
+        store = resultstore.ResultStore(args.results,
+                                        resultstore.signature(__file__, termdb.__file__, *termfiles,
+                                                              importlib.metadata.version("pymarc")))
 
     # Now that we have the LC data loaded, scan the input file / table
 
     errorCounter = Counter()
     errorSet = set()             # just so we don't print a given bad heading twice
 
+    complete = True
+
     with create_file_context(listfile, 'w', encoding="utf-8") as outfile:
-        for c, (bn, thefield) in enumerate(subjectheadinggenerator(recordgenerator)):
+        for c, (bn, tag, indicatorString, subfieldString, errors) in enumerate(classifiedfields(args, classify, store)):
 
             # limiting c to a low value is just a cheap way to limit the damage while debugging
             if c > 999999:
+                complete = False
                 break
 
-            indicatorString = (thefield.indicator1 + thefield.indicator2).replace(" ", "\\")
-            printString = f"{bn:3} : {thefield.tag} {indicatorString} : "
+            printString = f"{bn:3} : {tag} {indicatorString} : " + subfieldString
             printFlag = False
-            for subfieldcode, subfieldvalue in thefield:
-                subfieldvalue =  strip_punctuation(subfieldvalue)  # strip *some* punctuation
-                printString += "$" + subfieldcode + ":" + subfieldvalue
-                if "Fictitious character" in subfieldvalue:
-                    printString += "(FC) : "
+            for error in errors:
+                if error is None:
                     printFlag = False        # forgive earlier errors
-                elif subfieldcode == 'd':    # date => person from LCNAF
-                    printString += "(D) : "     # D for date
-                    printFlag = False        # forgive earlier errors (presumably name)
-                elif subfieldcode in ['c', 'v', '2']:
-                    printString += "(I) : "     # I for ignore
-                elif subfieldvalue in subjectTermsSet:
-                    printString += "(Y) : "  # Y for yes, found
-                elif subfieldvalue in childrenstermsSet:
-                    printString += "(C) : "     # C for children's subject heading
-                    # this is an error because the second indicator = 1
-                    printFlag = printFlag if subfieldvalue in errorSet else True
-                    errorSet.add(subfieldvalue)
-                    errorCounter[subfieldvalue+"(C)"] += 1
                 else:
-                    printString += "(N) : "
+                    subfieldvalue, errorKey = error
                     printFlag = printFlag if subfieldvalue in errorSet else True
                     errorSet.add(subfieldvalue)
-                    errorCounter[subfieldvalue+"(N)"] += 1
+                    errorCounter[errorKey] += 1
 
             if printFlag:
                 print(printString, file=outfile)
@@ -174,5 +265,15 @@ def main():
         for k, v in errorCounter.items():
             print(f"{v}, {k}", file=outfile)
 
+    cacheInfo = classify.cache_info()
+    lookups = cacheInfo.hits + cacheInfo.misses
+    print(f"Heading cache: {cacheInfo.hits} of {lookups} fields already seen "
+          f"({cacheInfo.hits / lookups if lookups else 0:.1%}), {cacheInfo.currsize} remembered", file=sys.stderr)
+
+    if store:
+        # only forget the records which have gone if we read the whole file
+        store.close(prune=complete)
+        print(store.summary(), file=sys.stderr)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
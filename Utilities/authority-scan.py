@@ -0,0 +1,60 @@
+#
+#    Run several analyses of a Library of Congress ndjson download (e.g., the LCSH or
+#    the LCNAF in MADS/RDF format, from https://id.loc.gov/download/) in one pass.
+#
+#    Usage:  python authority-scan.py <input file> [ --workers N ]
+#               [ --terms <filename> [ --types <type> ... ] ]
+#               [ --genders <detail filename> <simple filename> ]
+#               [ --gender-errors <filename> [ --debug ] ]
+#
+#    The input file can be gzipped (as downloaded) or not.  Each analysis writes the
+#    same output as the program it comes from:
+#
+#        --terms          LCSH/scan-subjects-madsrdf-jsonld.py
+#        --genders        LCNAF/lcnaf-gender.py (the two gender count files)
+#        --gender-errors  LCNAF/lcnaf-gender-errors.py
+#
+#    but the file is only read and parsed once, however many you ask for.  The LCNAF
+#    is big enough that this matters.
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+import sys
+
+from lib import authorityscan
+from lib.subjectterms import ScanError
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several analyses of an LC ndjson download in one pass.")
+    parser.add_argument("inputfile")
+    parser.add_argument("--workers", "-w", type=int, default=1)
+    parser.add_argument("--terms", help="write subject headings (like scan-subjects-madsrdf-jsonld.py)")
+    parser.add_argument("--types", nargs="+", default=None, help="with --terms, only these node types")
+    parser.add_argument("--genders", nargs=2, metavar=("DETAIL", "SIMPLE"), help="write gender counts")
+    parser.add_argument("--gender-errors", help="write gender errors")
+    parser.add_argument("--debug", action="store_true", help="with --gender-errors, include the nodes in error")
+    args = parser.parse_args()
+
+    visitors = []
+    if args.terms:
+        visitors.append(authorityscan.SubjectTerms(args.terms, args.types))
+    if args.genders:
+        visitors.append(authorityscan.GenderCounts(*args.genders))
+    if args.gender_errors:
+        visitors.append(authorityscan.GenderErrors(args.gender_errors, args.debug))
+    if not visitors:
+        parser.error("nothing to do:  give at least one of --terms, --genders and --gender-errors")
+
+    try:
+        authorityscan.run(args.inputfile, visitors, args.workers)
+    except ScanError as error:
+        print(error.message)
+        print(error.item)
+        sys.exit(1)
@@ -10,7 +10,10 @@
 #    means that field 018 is not repeatable, and can have subfields $a, $6 an $8, of
 #    which only $8 is repeatable.
 #
-#    Usage:  python field_subfield_repeatability.py -o <output file>
+#    Usage:  python field_subfield_repeatability.py -o <output file> [ -c [ <cache file> ] ]
+#
+#    With -c, downloaded pages are kept in a cache file (default http-cache.sqlite) so
+#    a rerun doesn't download them again.
 #
 #    The program also writes progress to the terminal and writes a log file,
 #    field_subfield_repeatability.log
@@ -29,11 +32,12 @@
 
 import requests
 import re
-import time
 import argparse
 from urllib.parse import urljoin
 import logging
 
+from lib import httpcache
+
 
 # Create the logger
 logger = logging.getLogger("SmartLogger")
@@ -60,7 +64,7 @@ logger.addHandler(console_handler)
 def get_concise_links(base_url, session):
     logger.info(f"Requesting base URL: {base_url}")
     try:
-        response = session.get(base_url, timeout=10)
+        response = httpcache.get(session, base_url, timeout=10)
         logger.debug(f"Received response: {response.status_code}")
         response.raise_for_status()
         current_page = response.text
@@ -78,14 +82,13 @@ def get_concise_links(base_url, session):
 
 
 def process_child_pages(urls, out_f, session, delay=5):
-    for i, url in enumerate(urls):
-        if i > 0:
-            logger.debug(f"Waiting {delay} seconds...")
-            time.sleep(delay)
-        
+    # Ask for all the pages up front.  lib/ratelimit.py spaces the requests
+    # delay seconds apart, and we work on each page while the next one waits.
+    pages = [ httpcache.submit(session, url, delay=delay, timeout=10) for url in urls ]
+    for url, page in zip(urls, pages):
         logger.info(f"Fetching {url}...")
         try:
-            response = session.get(url, timeout=10)
+            response = page.result()
             response.raise_for_status()
             current_page = response.text
             logger.debug(f"Successfully retrieved {len(current_page)} bytes.")
@@ -158,6 +161,8 @@ def process_child_pages(urls, out_f, session, delay=5):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fetch MARC documentation and extract H1 headers.")
     parser.add_argument("-o", "--output", required=True, help="Path to the output file for extracted tags.")
+    parser.add_argument("-c", "--cache", nargs="?", const=httpcache.DEFAULT_CACHEFILE, default=None,
+                        help="Keep downloaded pages in this cache file between runs.")
     args = parser.parse_args()
 
     logger.debug("Started ...")
@@ -179,11 +184,16 @@ if __name__ == "__main__":
             "Referer": base_url
         })
 
+        if args.cache:
+            session = httpcache.CachedSession(httpcache.ResponseCache(args.cache), session)
+
         concise_urls = get_concise_links(base_url, session)
         
         if concise_urls:
             with open(args.output, "w", encoding="utf-8") as out_f:
                 process_child_pages(concise_urls, out_f, session)
             logger.info("\nAll retrievals complete.")
+            if args.cache:
+                logger.info(session.cache.summary())
         else:
             logger.error("No links found to fetch.")
@@ -0,0 +1,40 @@
+#
+#    Build a local store of Library of Congress authority records, keyed by LCCN,
+#    for lccn-to-marcxml.py to use instead of downloading from id.loc.gov.
+#
+#    Usage:  python lc-authority-store.py <store-file> <download-file> [ <download-file> ... ]
+#
+#    The download files are the MARC bulk downloads from https://id.loc.gov/download/,
+#    either MARCXML (.xml or .xml.gz, e.g., lcnaf.both.xml.gz) or MARC 21 (.mrc).
+#    (The MADS/RDF files read by LCNAF/lcnaf-gender.py don't include the MARC record.)
+#
+#    Records are added to the store file (e.g., lc-authorities.sqlite), replacing any
+#    record with the same LCCN, so you can build the store from several downloads, or
+#    load a newer download on top of an older one.  Then:
+#
+#        python lccn-to-marcxml.py lccns.txt output.xml --store lc-authorities.sqlite
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+
+from lib import authoritystore
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a local store of LC authority records keyed by LCCN.")
+    parser.add_argument("storefile", help="SQLite file to create or add to")
+    parser.add_argument("inputfiles", nargs="+", help="MARCXML (.xml, .xml.gz) or MARC (.mrc) downloads")
+    args = parser.parse_args()
+
+    store = authoritystore.AuthorityStore(args.storefile)
+    for inputfile in args.inputfiles:
+        count = store.load(authoritystore.read_dump(inputfile))
+        print(f"{inputfile}: {count} records")
+    print(f"{args.storefile}: {len(store)} records")
+    store.close()
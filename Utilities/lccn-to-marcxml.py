@@ -2,14 +2,37 @@
 #    Read a file of Library of Congress control numbers, one per line, download the
 #    corresponding records in MARCXML format from id.loc.gov, and write the MARCXML to a file.
 #
-#    Usage:  python lccn-to-marcxml.py <input-file> <output-file>
+#    Usage:  python lccn-to-marcxml.py <input-file> <output-file> [ <cache-file> ]
+#               [ --checkpoint <checkpoint-file> ] [ --restart ] [ --retries N ]
+#               [ --store <store-file> ]
+#
+#    If a store file is given (built by lc-authority-store.py from the LC bulk download),
+#    records are taken from the store, and only LCCNs which aren't in the store are
+#    downloaded from id.loc.gov.
+#
+#    If a cache file is given (e.g., http-cache.sqlite), downloaded records are kept
+#    in it, and records which are already in the cache aren't downloaded again.
 #
 #    For example, if the DATASET is "names" (defined below) and one line of the input file
 #    is "no2015128232", the MARCXML is downloaded from
 #    https://id.loc.gov/authorities/names/no2015128232.marcxml.xml
 #
+#    Each record is written to the output file as soon as it arrives, and its LCCN is
+#    added to a checkpoint file (by default, the output file name + ".done"), along with
+#    the size of the output file at that point.  If the program stops part way through a
+#    long list, just run it again with the same arguments:  LCCNs in the checkpoint file
+#    are skipped, anything written after the last checkpointed record is cut off, and
+#    new records are added to the end of the output file.  Use --restart to ignore the checkpoint file and
+#    start the output file from scratch.  If the output file is missing, the checkpoint
+#    file is ignored (and deleted) too.
 #
-#    Version:  0.1.0  6/25/25
+#    Requests which fail with 429 (too many requests) or a 5xx server error, or which
+#    can't connect, are retried (--retries times) with an increasing wait in between.
+#    While we wait, no other request goes to id.loc.gov either.
+#    LCCNs which still fail aren't added to the checkpoint file, so they're tried again
+#    on the next run.
+#
+#    Version:  0.3.0  10/18/26
 #
 #    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
 #
@@ -18,9 +41,13 @@
 #
 
 
+import argparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
 import requests
-import sys
-import time
+
+from lib import authoritystore, httpcache, ratelimit
 
 # DATASET = "nameS" for the LCNAF, "subjectS" for LCSH, etc.
 # For more details, see the Resource Retrieval section
@@ -30,6 +57,14 @@ DATASET = "names"
 # As required by id.loc.gov/robots.txt
 REQUIRED_DELAY = 3  # seconds
 
+# Statuses worth trying again, and the first wait before trying (doubled each time)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+BACKOFF = 10  # seconds
+
+# Number of requests in flight at once.  They still go out REQUIRED_DELAY seconds
+# apart, but the next request is waiting its turn while we write the last record.
+WINDOW = 4
+
 # Needed for MarcEdit
 xmlpreamble = """\
 <?xml version="1.0" encoding="UTF-8" ?>\
@@ -39,25 +74,136 @@ xsi:schemaLocation="http://www.loc.gov/MARC21/slim http://www.loc.gov/standards/
 
 xmlpostamble = "</marc:collection>"
 
-if len(sys.argv) < 3:
-    print("""Usage: python lccn-to-marcxml.py <input-file> <output-file>\n
-    Input file is a list of LC numbers (e.g., no2015128232) one per line.
-    Output file is MARC XML which MarcEdit should accept.""")
-    exit(1)
-
-with open(sys.argv[1], "r") as input_file:
-    with open(sys.argv[2], "w") as output_file:
-            output_file.write(xmlpreamble)
-            for line in input_file:
-                line = line.strip()
-                if line.startswith("#"):
-                    continue
-                url = f"https://id.loc.gov/authorities/{DATASET}/{line}.marcxml.xml"
-                # print(url)         # just for debugging
-                response = requests.get(url)
-                if response.status_code == 200:
-                    output_file.write(response.text + "\n")
-                else:
-                    print(f"Error {response.status_code} for {url}")
-                time.sleep(REQUIRED_DELAY)
-            output_file.write(xmlpostamble)
\ No newline at end of file
+# GET url, retrying on 429/5xx/connection errors.  Returns the last response, or
+# None if we never got one
+def fetch(session, url, retries):
+    response = None
+    for attempt in range(retries + 1):
+        if attempt:
+            # honour Retry-After (in seconds) if the server sends one
+            retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+            wait = int(retry_after) if retry_after.isdigit() else BACKOFF * 2 ** (attempt - 1)
+            print(f"Retrying {url} in {wait} seconds")
+            # hold back every request to the host, not just this one
+            ratelimit.scheduler().pause(url, wait)
+        try:
+            response = httpcache.get(session, url, delay=REQUIRED_DELAY, timeout=30)
+        except requests.RequestException as e:
+            print(f"Error {e} for {url}")
+            response = None
+            continue
+        if response.status_code not in RETRY_STATUS:
+            break
+    return response
+
+# open the output file for appending records.  If we're carrying on from an earlier run,
+# cut the file back to size, the size after the last record in the checkpoint file, so
+# a record written just before the earlier run stopped (and which will be downloaded
+# again) isn't in the file twice.  This takes off the closing </marc:collection> too.
+# A checkpoint file written without sizes only gets the </marc:collection> taken off
+def open_output(filename, resume, size=None):
+    if resume and os.path.exists(filename) and size is not None:
+        with open(filename, "rb+") as output_file:
+            output_file.truncate(size)
+        return open(filename, "a", encoding="utf-8")
+    if resume and os.path.exists(filename):
+        with open(filename, "rb+") as output_file:
+            output_file.seek(0, os.SEEK_END)
+            size = output_file.tell()
+            tail_length = min(size, len(xmlpostamble) + 16)
+            output_file.seek(size - tail_length)
+            tail = output_file.read().rstrip()
+            if tail.endswith(xmlpostamble.encode("utf-8")):
+                output_file.truncate(size - tail_length + len(tail) - len(xmlpostamble))
+        return open(filename, "a", encoding="utf-8")
+    output_file = open(filename, "w", encoding="utf-8")
+    output_file.write(xmlpreamble)
+    return output_file
+
+# write one downloaded record, then mark its LCCN done, with the size of the output file.
+# The record goes out first, so if we're stopped in between, the record is downloaded
+# again, and open_output cuts the first copy off the output file.
+# A 404 is done too (there's no point asking again), but a request that never succeeded isn't.
+def write_result(output_file, checkpoint, lccn, url, future):
+    response = future.result()
+    if response is None:
+        return
+    if response.status_code == 200:
+        output_file.write(response.text + "\n")
+        output_file.flush()
+    else:
+        print(f"Error {response.status_code} for {url}")
+    if response.status_code not in RETRY_STATUS:
+        output_file.flush()
+        print(lccn, os.fstat(output_file.fileno()).st_size, sep="\t", file=checkpoint, flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="""Download MARCXML records from id.loc.gov.
+        Input file is a list of LC numbers (e.g., no2015128232) one per line.
+        Output file is MARC XML which MarcEdit should accept.""")
+    parser.add_argument("inputfile")
+    parser.add_argument("outputfile")
+    parser.add_argument("cachefile", nargs="?", default=None,
+                        help="keep downloaded records in this cache file")
+    parser.add_argument("--checkpoint", default=None,
+                        help="file listing LCCNs already done (default: output file + .done)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint file and start the output file again")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--store", default=None,
+                        help="local store of LC authority records (see lc-authority-store.py)")
+    args = parser.parse_args()
+
+    checkpointfile = args.checkpoint or args.outputfile + ".done"
+    if args.restart and os.path.exists(checkpointfile):
+        os.remove(checkpointfile)
+    # the records the checkpoint says are done are in the output file, so without
+    # the output file the checkpoint is no use
+    if os.path.exists(checkpointfile) and not os.path.exists(args.outputfile):
+        print(f"{args.outputfile} doesn't exist, so starting again without {checkpointfile}")
+        os.remove(checkpointfile)
+    done = set()
+    size = None         # of the output file, after the last record in the checkpoint file
+    if os.path.exists(checkpointfile):
+        with open(checkpointfile, encoding="utf-8") as checkpoint:
+            for line in checkpoint:
+                if (fields := line.split()):
+                    done.add(fields[0])
+                    size = int(fields[1]) if len(fields) > 1 else None
+        print(f"Skipping {len(done)} LCCNs already in {checkpointfile}")
+
+    with open(args.inputfile, "r") as input_file:
+        lccns = [ line.strip() for line in input_file ]
+    lccns = [ lccn for lccn in lccns if lccn and not lccn.startswith("#") and lccn not in done ]
+
+    # one session, so the connection to id.loc.gov is reused for every request
+    session = requests.Session()
+    if args.cachefile:
+        session = httpcache.CachedSession(httpcache.ResponseCache(args.cachefile), session)
+    store = authoritystore.AuthorityStore(args.store) if args.store else None
+
+    with (open_output(args.outputfile, resume=bool(done), size=size) as output_file,
+          open(checkpointfile, "a", encoding="utf-8") as checkpoint,
+          ThreadPoolExecutor(max_workers=WINDOW) as fetcher):
+        # records are written in input order, each as soon as it (and everything before it) arrives
+        pending = deque()
+        for lccn in lccns:
+            url = f"https://id.loc.gov/authorities/{DATASET}/{lccn}.marcxml.xml"
+            if store is not None and (marcxml := store.lookup(lccn)) is not None:
+                future = Future()
+                future.set_result(httpcache.CachedResponse(url, 200, marcxml.encode("utf-8"), "utf-8", {}))
+            else:
+                future = fetcher.submit(fetch, session, url, args.retries)
+            pending.append((lccn, url, future))
+            while pending and (len(pending) >= WINDOW or pending[0][2].done()):
+                write_result(output_file, checkpoint, *pending.popleft())
+        while pending:
+            write_result(output_file, checkpoint, *pending.popleft())
+        output_file.write(xmlpostamble)
+
+    if store is not None:
+        print(store.summary())
+        store.close()
+    if isinstance(session, httpcache.CachedSession):
+        print(session.cache.summary())
+    session.close()
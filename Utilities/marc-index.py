@@ -0,0 +1,39 @@
+#
+#    Build or refresh the sidecar index for one or more MARC files.
+#
+#    Usage:  python marc-index.py [ --force ] <MARC file> [ <MARC file> ... ]
+#
+#    For each MARC file, say catalog.mrc, this writes catalog.mrc.idx, which lists
+#    the byte offset, length and 001 of every record.  The console applications use
+#    the index (via lib/marcindex.py and lib/mymarc.py) to jump straight to a record
+#    by its 001, to start reading at record N, or to give parallel workers equal
+#    shares of the file.
+#
+#    An index which is already up to date (i.e., the MARC file hasn't changed since
+#    the index was built) is left alone unless you specify --force.  So you can run
+#    this after every export and only pay for the files that changed.
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+
+from lib import marcindex
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the sidecar index for MARC files.")
+    parser.add_argument("inputfiles", nargs="+", help="MARC files to index")
+    parser.add_argument("--force", "-f", action="store_true", help="rebuild even if the index is up to date")
+    args = parser.parse_args()
+
+    for inputfile in args.inputfiles:
+        if not args.force and marcindex.is_fresh(inputfile):
+            print(f"{marcindex.index_path(inputfile)} is up to date")
+            continue
+        index = marcindex.build_index(inputfile)
+        print(f"{marcindex.index_path(inputfile)}: {len(index)} records")
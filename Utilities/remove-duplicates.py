@@ -8,19 +8,23 @@
 #                -o <output MARC file>
 #                [ -f <field tag> ]
 #                [ -d ]
+#                [ --frequencies <output file> ]
 #
 #    Normalization rules for duplication check:
 #    (i)   Extract and concatenate all alphabetic subfields.
 #    (ii)  Remove everything but letters.
 #    (iii) Convert to lowercase.
+#    (This is fingerprint.letters_key in lib/fingerprint.py.)
 #
 #    The -f / --field option defaults to 650.
 #    The -d / --debug option prints record numbers and deleted fields.
+#    The --frequencies option writes the number of records using each heading
+#    (in the -f field), most used first, to a tab-separated file.
 #
 #    A summary of records processed, records changed, and fields deleted 
 #    is displayed at the end.
 #
-#    Version:  0.1.0  3/2/26
+#    Version:  0.2.0  10/18/26
 #
 #    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
 #
@@ -30,32 +34,20 @@
 
 import sys
 import argparse
-import re
 from pymarc import MARCReader, MARCWriter
 
-def normalize_field(field):
-    """
-    Normalizes a MARC field according to the following rules:
-    (i)   Extract and concatenate all alphabetic subfields, but not numeric subfields
-    (ii)  Remove everything but letters
-    (iii) Convert to lowercase
-    """
-    # (i) Extract and concatenate all alphabetic subfields (a-z, A-Z)
-    extracted_parts = [subfield.value for subfield in field.subfields if subfield.code.isalpha()]
-    concatenated = "".join(extracted_parts)
-    
-    # (ii) Remove everything but letters
-    letters_only = re.sub(r'[^a-zA-Z]', '', concatenated)
-    
-    # (iii) Convert to lowercase
-    return letters_only.lower()
+from lib import fingerprint
 
-def process_marc(input_file, output_file, target_field, debug=False):
+def process_marc(input_file, output_file, target_field, debug=False, frequencies=None):
     """
     Reads records from input_file, removes duplicate fields (specified by target_field),
     and writes to output_file. Tracks and prints record and field counts.
     If debug is True, prints details of modified records.
+    If frequencies is a file name, writes the number of records using each heading to it.
     """
+    # only count the headings if they're wanted:  the index holds every heading
+    # in the file, where duplicates() only holds one record's worth
+    headings = fingerprint.HeadingIndex() if frequencies else None
     records_processed = 0
     records_changed = 0
     fields_deleted = 0
@@ -71,17 +63,13 @@ def process_marc(input_file, output_file, target_field, debug=False):
                 
                 records_processed += 1
                 
-                # Track fields for the current record in normalized form
-                seen_normalized = set()
-                to_be_deleted = []
-                
-                for field in record.fields:
-                    if field.tag == target_field:
-                        norm = normalize_field(field)
-                        if norm in seen_normalized:
-                            to_be_deleted.append(field)
-                        else:
-                            seen_normalized.add(norm)
+                # Find the fields which are duplicates once normalized,
+                # counting the headings as we go if asked to
+                fields = record.get_fields(target_field)
+                if headings is None:
+                    to_be_deleted = fingerprint.duplicates(fields)
+                else:
+                    to_be_deleted = headings.add(fields)
                 
                 # Remove the duplicate fields
                 if to_be_deleted:
@@ -106,16 +94,21 @@ def process_marc(input_file, output_file, target_field, debug=False):
     print(f"  Records changed:   {records_changed}")
     print(f"  Fields deleted:    {fields_deleted}")
 
+    if frequencies:
+        headings.write(frequencies)
+        print(f"  Headings:          {len(headings.counts)} (written to {frequencies})")
+
 def main():
     parser = argparse.ArgumentParser(description="Remove duplicate fields from MARC records.")
     parser.add_argument("-i", "--input", required=True, help="Input MARC file path")
     parser.add_argument("-o", "--output", required=True, help="Output MARC file path")
     parser.add_argument("-f", "--field", default="650", help="MARC field tag to deduplicate (default: 650)")
     parser.add_argument("-d", "--debug", action="store_true", help="Print record number and deleted fields for modified records")
+    parser.add_argument("--frequencies", default=None, help="Write the number of records using each heading to this file")
     
     args = parser.parse_args()
     
-    process_marc(args.input, args.output, args.field, args.debug)
+    process_marc(args.input, args.output, args.field, args.debug, args.frequencies)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,66 @@
+#
+#    Compare the original row-at-a-time mydb.Table.readmarc with the streaming
+#    (unbuffered cursor + fetchmany) version, reporting rows/sec and peak RSS.
+#
+#    Usage:  python readmarc-benchmark.py --inputtable <database table>
+#               [ --schema <schema> ] [ --batchsizes N N ... ] [ --limit N ]
+#
+#    Each mode runs in a separate process, so that the peak memory of one
+#    mode doesn't hide the peak memory of the next.
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from lib import mydb
+
+# peak resident set size in MB.  Linux reports ru_maxrss in KB, macOS in bytes
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_once(schema, table, batchsize, limit):
+    cnx = mydb.Connection(schema=schema)
+    query = f"LIMIT {limit}" if limit else ""
+    rows = 0
+    start = time.perf_counter()
+    for _ in mydb.Table(cnx, table).readmarc(query, batchsize or None):
+        rows += 1
+    elapsed = time.perf_counter() - start
+    return { "batchsize": batchsize, "rows": rows, "seconds": elapsed,
+             "rows_per_sec": rows / elapsed if elapsed else 0.0, "peak_rss_mb": peak_rss_mb() }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inputtable", "-it", required=True)
+    parser.add_argument("--schema", default="world")
+    parser.add_argument("--batchsizes", "-b", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--limit", type=int, default=0, help="only read this many rows")
+    parser.add_argument("--one", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        # child process:  run a single mode and report back as JSON
+        print(json.dumps(run_once(args.schema, args.inputtable, args.one, args.limit)))
+        sys.exit(0)
+
+    print(f"{'batch size':>12} {'rows':>12} {'seconds':>9} {'rows/sec':>12} {'peak RSS MB':>12}")
+    for batchsize in [0] + args.batchsizes:       # 0 = original fetchone loop
+        child = subprocess.run([sys.executable, __file__, "--inputtable", args.inputtable,
+                                "--schema", args.schema, "--limit", str(args.limit),
+                                "--one", str(batchsize)],
+                               capture_output=True, text=True, check=True)
+        r = json.loads(child.stdout)
+        label = "fetchone" if not batchsize else str(batchsize)
+        print(f"{label:>12} {r['rows']:>12} {r['seconds']:>9.2f} {r['rows_per_sec']:>12.0f} {r['peak_rss_mb']:>12.1f}")
@@ -0,0 +1,90 @@
+#
+#    Micro-benchmark for lib/tagdata.py:  decode tagData strings into pymarc Fields
+#    with the loop that used to live in mydb.Table.readpymarc, with tagdata.decode_rows,
+#    and with tagdata.decode_rows skipping the fields that recordscan.py doesn't look at.
+#
+#    Usage:  python tagdata-benchmark.py <MARC file> [ --repeat N ]
+#
+#    The MARC file is only used to get realistic fields.  Each record is turned into
+#    (tag, indicators, tagData) rows, the same as reading the per-field database table.
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+import time
+
+import pymarc
+from pymarc import Field
+
+from lib import tagdata
+
+# The tags recordscan.py looks at
+RECORDSCAN_TAGS = ['001', '006', '041', '100', '110', '245', '546', '600', '610', '611',
+                   '630', '650', '651', '655', '700', '710', '711', '720', '730']
+
+# This is the loop from mydb.Table.readpymarc before tagdata.py existed
+def original(rows):
+    fields = []
+    for tag, indicators, tagData in rows:
+        if tag[0:2] == "00":
+            fields.append(Field(tag = tag, data = tagData))
+        else:
+            subfields = list()
+            merge = ""
+            for subfield in tagData.split('$')[1:]:
+                if len(subfield) < 2:
+                    merge = subfield + "$"
+                    continue
+                sf = merge + subfield
+                subfields.extend([sf[0], sf[1:]])
+                merge = ""
+            fields.append(Field(tag = tag, indicators = list(indicators), subfields = subfields))
+    return fields
+
+def rows_from_marc(filename):
+    records = []
+    with open(filename, 'rb') as marc_input:
+        for aRecord in pymarc.MARCReader(marc_input):
+            rows = []
+            for aField in aRecord.fields:
+                if aField.is_control_field():
+                    rows.append((aField.tag, "", aField.data))
+                else:
+                    rows.append((aField.tag, "".join(aField.indicators), tagdata.encode(aField.subfields)))
+            records.append(rows)
+    return records
+
+def timeit(label, fn, records, repeat, nrows):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for rows in records:
+            fn(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:32} {elapsed:8.3f} s   {1e6 * elapsed / (nrows * repeat):8.3f} us/row")
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputfile", help="MARC file to take fields from")
+    parser.add_argument("--repeat", "-r", type=int, default=20)
+    args = parser.parse_args()
+
+    records = rows_from_marc(args.inputfile)
+    nrows = sum(len(rows) for rows in records)
+
+    # make sure we're comparing like with like
+    for rows in records:
+        assert [ str(f) for f in original(rows) ] == [ str(f) for f in tagdata.decode_rows(rows) ]
+
+    print(f"{len(records)} records, {nrows} field rows, {args.repeat} repeats\n")
+    base = timeit("original loop", original, records, args.repeat, nrows)
+    new = timeit("tagdata.decode_rows", tagdata.decode_rows, records, args.repeat, nrows)
+    skip = timeit("decode_rows, recordscan tags", lambda rows: tagdata.decode_rows(rows, RECORDSCAN_TAGS),
+                  records, args.repeat, nrows)
+    print(f"\nspeedup: {base / new:.2f}x, {base / skip:.2f}x skipping unused tags")
@@ -0,0 +1,104 @@
+#
+#    Compare the memory-mapped term tables in lib/termdb.py with the Python sets
+#    that subjects-check.py used to build, reporting load time, memory and the
+#    time for one "term in terms" lookup.
+#
+#    Usage:  python termdb-benchmark.py <term list> [ --lookups N ]
+#
+#    The term list is a file written by build-lists.py, e.g., subject-terms.txt.
+#    Each mode runs in a separate process, so that the memory of one mode
+#    doesn't hide the memory of the next.
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from lib import termdb
+
+# resident set size in MB.  On Linux, the current size from /proc; elsewhere the
+# peak size, which is the same thing here since memory only goes up
+def rss_mb():
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def time_lookups(terms, probes):
+    start = time.perf_counter()
+    for probe in probes:
+        probe in terms
+    return (time.perf_counter() - start) / len(probes) * 1e9
+
+def run_once(mode, termfile, dbfile, probefile):
+    # the probes are read before measuring, so they don't count towards either mode's memory
+    with open(probefile, encoding="utf-8") as probes_input:
+        probes = probes_input.read().split("\n")
+    hits = probes[:len(probes) // 2]
+    misses = probes[len(probes) // 2:]
+
+    before = rss_mb()
+    start = time.perf_counter()
+    if mode == "set":
+        terms = termdb.read_terms(termfile)
+    else:
+        terms = termdb.TermDB.load(dbfile).subjects
+    load = time.perf_counter() - start
+    loaded = rss_mb()
+    hit_ns = time_lookups(terms, hits)
+    miss_ns = time_lookups(terms, misses)
+    return { "mode": mode, "terms": len(terms), "load_seconds": load,
+             "load_mb": loaded - before, "after_lookups_mb": rss_mb() - before,
+             "hit_ns": hit_ns, "miss_ns": miss_ns }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("termfile", help="a term list written by build-lists.py")
+    parser.add_argument("--lookups", type=int, default=100000, help="number of hits (and misses) to look up")
+    parser.add_argument("--one", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--db", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--probes", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one is not None:
+        # child process:  run a single mode and report back as JSON
+        print(json.dumps(run_once(args.one, args.termfile, args.db, args.probes)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        dbfile = os.path.join(tempdir, "terms.db")
+        probefile = os.path.join(tempdir, "probes.txt")
+        terms = termdb.read_terms(args.termfile)
+        termdb.TermDB(terms, set()).save(dbfile)
+        # half terms which are there, half which aren't
+        random.seed(1)
+        sample = random.choices(sorted(terms), k=args.lookups)
+        with open(probefile, 'w', encoding="utf-8") as probes_output:
+            probes_output.write("\n".join(sample + [ f"{term} (not a term)" for term in sample ]))
+        del terms, sample
+        print(f"{'mode':>8} {'terms':>10} {'load secs':>10} {'load MB':>9} {'MB after':>9} {'hit ns':>8} {'miss ns':>8}")
+        for mode in ("set", "termdb"):
+            child = subprocess.run([sys.executable, __file__, args.termfile, "--lookups", str(args.lookups),
+                                    "--one", mode, "--db", dbfile, "--probes", probefile],
+                                   capture_output=True, text=True, check=True)
+            r = json.loads(child.stdout)
+            print(f"{mode:>8} {r['terms']:>10} {r['load_seconds']:>10.3f} {r['load_mb']:>9.1f} "
+                  f"{r['after_lookups_mb']:>9.1f} {r['hit_ns']:>8.0f} {r['miss_ns']:>8.0f}")
+        print(f"\nterms.db is {os.path.getsize(dbfile) / (1024 * 1024):.1f} MB on disk, "
+              "shared (through the page cache) by every process that loads it")
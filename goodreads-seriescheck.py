@@ -4,10 +4,14 @@
 #    and 830 fields, if any.
 #
 #    Usage:  python goodreads-seriescheck.py -if <MARC input file> [ -of <output file> ] [ -sep <separator> ]
+#               [ --cache [ <cache file> ] ]
 #
 #    The output file is written in Excel-compatible CSV file.  The output file defaults to the console.
 #    The separator defaults to comma.
 #
+#    With --cache, Goodreads responses are kept in a cache file (default http-cache.sqlite)
+#    so rerunning over the same records doesn't ask Goodreads again.
+#
 #    The columns in the CSV file are:  an index number, the 100a, the 245a, the 490a or None, the 800t or 830a or None,
 #    the series information from Goodreads, and a 'Y' indication if the series information from Goodreads does not
 #    matches the series information in the record.
@@ -25,13 +29,18 @@
 
 
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import csv
 import pymarc
 import requests
 import sys
 
-from lib import goodreads
+from lib import goodreads, httpcache
+
+# lookups waiting (or done but not yet written) before we stop reading records
+WINDOW = 16
 
 def get_subfield(theRecord, tag, subfield):
     if not (fld := theRecord.get(tag)):
@@ -54,6 +63,16 @@ def compare_series(series_490, series_800, gr_series):
         return "None"
     return (gr_series == series_490) or (gr_series == series_800)
 
+def goodreads_row(session, i, author, title, series_490, series_8XX):
+    worknumber = goodreads.get_worknumber(session, author.split(',')[0], title)
+    if not worknumber:
+        gr_series = "No title match"
+        indicator = " "
+    else:
+        gr_series = goodreads.get_seriesname(session, worknumber)
+        indicator = " " if compare_series(series_490, series_8XX, gr_series) else "Y"
+    return [i, author, title, series_490, series_8XX, gr_series, indicator]
+
 # wrapper so stdout looks like a file with a context manager
 
 def create_file_context(file, mode="", encoding="utf-8"):
@@ -70,27 +89,37 @@ parser = argparse.ArgumentParser()
 parser.add_argument("--inputfile", "-if", help="MARC file to read", required=True)
 parser.add_argument("--outputfile", "-of", help="CSV output file", required=False, default=sys.stdout)
 parser.add_argument("--separator", "-sep", help="CSV separator character(s)", required=False, default=",")
+parser.add_argument("--cache", nargs="?", const=httpcache.DEFAULT_CACHEFILE, default=None,
+                    help="keep Goodreads responses in this cache file between runs")
 args = parser.parse_args()
 
 with requests.Session() as session:
     session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'})
+    if args.cache:
+        session = httpcache.CachedSession(httpcache.ResponseCache(args.cache), session)
    # Iterate over the records in the file and call Goodreads to get the series
     with ( open(args.inputfile, 'rb') as marc_input,
           create_file_context(args.outputfile, mode="w", encoding="utf-8") as csv_output):
         writer = csv.writer(csv_output, delimiter=args.separator)
         writer.writerow(["Index", "100a", "245a", "490a", "800t/830a", "Goodreads series", "Mismatch?"])
-        for i, aRecord in enumerate(pymarc.MARCReader(marc_input)):
-            author = get_subfield(aRecord, "100", "a").strip(",")
-            title = get_subfield(aRecord, "245", "a").strip(" /:")
-            series_490 = get_subfield(aRecord, "490", "a").strip(" ;")
-            series_8XX = get_series(aRecord).strip(" ;")
+        # Goodreads lookups run in the background (lib/ratelimit.py keeps them 2 seconds
+        # apart) while we read the next records.  Rows are written in input order.  Once
+        # WINDOW lookups are waiting, we wait for the first before reading on, so the
+        # queue doesn't grow to the size of the file
+        with ThreadPoolExecutor(max_workers=4) as lookups:
+            pending = deque()
+            for i, aRecord in enumerate(pymarc.MARCReader(marc_input)):
+                author = get_subfield(aRecord, "100", "a").strip(",")
+                title = get_subfield(aRecord, "245", "a").strip(" /:")
+                series_490 = get_subfield(aRecord, "490", "a").strip(" ;")
+                series_8XX = get_series(aRecord).strip(" ;")
 
-            # get data from Goodreads corresponding to the record
-            worknumber = goodreads.get_worknumber(session, author.split(',')[0], title)
-            if not worknumber:
-                gr_series = "No title match"
-                indicator = " "
-            else:
-                gr_series = goodreads.get_seriesname(session, worknumber)
-                indicator = " " if compare_series(series_490, series_8XX, gr_series) else "Y"
-            writer.writerow([i, author, title, series_490, series_8XX, gr_series, indicator])
\ No newline at end of file
+                # get data from Goodreads corresponding to the record
+                lookup = lookups.submit(goodreads_row, session, i, author, title, series_490, series_8XX)
+                pending.append(lookup)
+                while pending and (len(pending) >= WINDOW or pending[0].done()):
+                    writer.writerow(pending.popleft().result())
+            for lookup in pending:
+                writer.writerow(lookup.result())
+    if args.cache:
+        print(session.cache.summary(), file=sys.stderr)
\ No newline at end of file
@@ -0,0 +1,244 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import heapq
+import itertools
+import os
+import re
+import shutil
+import sys
+import tempfile
+import weakref
+from typing import Iterable, Iterator, List, Tuple
+
+# Finding possible duplicate author names (e.g., Smith, Bob ~ Smith, Bob, 1972-)
+# among the names harvested from 100 and 700 fields by recordscan.py.  Each name
+# is the $a and $d subfields jammed together:  "Smith, Bob#1972-"
+#
+# Two names can only match if their name parts are the same, so the names are
+# put into blocks by (case-folded) name part and every pair of names within a
+# block is compared.  A cluster is a group of names which all match each other:
+# "Smith, Bob#1972-" ~ "Smith, Bob" ~ "smith, bob#1972-1999."  An undated name can
+# match two dated names which don't match each other, so it can be in two clusters:
+# "Smith, Bob" ~ "Smith, Bob#1950-" and "Smith, Bob" ~ "Smith, Bob#1972-"
+#
+# The names are collected in an AuthorStore, in memory up to a limit.  Past that,
+# the names are sorted by block in runs which are written to temporary files, and
+# the runs are merged as a stream, so only one block at a time has to fit in memory.
+# In memory, the names are kept as UTF-8 bytes, which are smaller than str.
+
+# split author string into name, birth date, death date, with missing values == None
+rgx = re.compile(r"(.*)(#\d{4}-)(\d{4}\.)?$")
+def author_split(author_string : str) -> Tuple:
+    m = rgx.match(author_string)
+    if not m:
+        return author_string, None, None
+    return m[1], m[2], m[3] if m.lastindex == 3 else None
+
+# When you're comparing two (name, birth date, death date) tuples, missing values match
+# anything, so only two non-None values can produce a False result
+def author_equals(x : str, y : str) -> bool:
+    for ax, ay in zip(author_split(x.casefold()), author_split(y.casefold())):
+        # ax and ay must be non-None to produce a false result
+        if ax and ay and ax != ay:
+            return False
+    return True
+
+# the block a name belongs in
+def block_key(author : str) -> str:
+    return author_split(author.casefold())[0]
+
+# Clusters of matching names in one block (a sorted list of names).  Every pair is
+# compared.  Then, for each name, its cluster is the name and, in order, every other
+# name which matches all the names already in the cluster.  A cluster which is
+# contained in another isn't returned, and nor are names with nothing to match.
+# The clusters come back sorted, in order of their first name
+def block_clusters(members : List[str]) -> List[List[str]]:
+    matches = [ set() for _ in members ]
+    for i in range(len(members)):
+        for j in range(i + 1, len(members)):
+            if author_equals(members[i], members[j]):
+                matches[i].add(j)
+                matches[j].add(i)
+    clusters = []
+    for i in range(len(members)):
+        cluster = { i }
+        candidates = set(matches[i])
+        for j in sorted(matches[i]):
+            if j in candidates:
+                cluster.add(j)
+                candidates &= matches[j]
+        if len(cluster) > 1 and not any(cluster <= other for other in clusters):
+            clusters = [ other for other in clusters if not other < cluster ] + [ cluster ]
+    return [ [ members[i] for i in cluster ] for cluster in sorted(sorted(cluster) for cluster in clusters) ]
+
+# (block key, name) pairs, sorted, written one name to a line (names come from
+# MARC subfields, which can't contain a newline).  Returns the file name
+def write_run(pairs : List[Tuple[str, str]], tempdir=None) -> str:
+    fd, filename = tempfile.mkstemp(prefix="authors-", suffix=".run", dir=tempdir)
+    with open(fd, 'w', encoding='utf-8', errors='surrogatepass', newline='\n') as run:
+        for _, author in pairs:
+            run.write(author)
+            run.write('\n')
+    return filename
+
+def read_run(filename : str) -> Iterator[Tuple[str, str]]:
+    with open(filename, encoding='utf-8', errors='surrogatepass', newline='\n') as run:
+        for line in run:
+            author = line[:-1]
+            yield block_key(author), author
+
+# Group a stream of (block key, name) pairs, sorted, into blocks.  The same name
+# can turn up more than once (e.g., in two runs) and is only kept once
+def sorted_blocks(pairs : Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, List[str]]]:
+    for key, group in itertools.groupby(pairs, key=lambda pair: pair[0]):
+        yield key, [ author for author, _ in itertools.groupby(author for _, author in group) ]
+
+# Merge sorted runs (see write_run) into one stream of blocks, deleting the runs when done
+def merge_runs(runs : List[str]) -> Iterator[Tuple[str, List[str]]]:
+    try:
+        yield from sorted_blocks(heapq.merge(*[ read_run(run) for run in runs ]))
+    finally:
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+
+# names are kept as UTF-8 bytes, which take less memory than str:  16 bytes less
+# for a plain ASCII name, and 40 or more less for a name with accents
+def _encode(author : str) -> bytes:
+    return author.encode('utf-8', 'surrogatepass')
+
+def _decode(author : bytes) -> str:
+    return author.decode('utf-8', 'surrogatepass')
+
+# delete a store's directory of runs, but only in the process which made it (a
+# forked worker has a copy of the store, and mustn't delete the directory when
+# its copy goes away)
+def _remove_rundir(path, pid):
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+class AuthorStore:
+
+    # The names harvested so far, held in a set until there are max_names of them
+    # or they take up about max_bytes of memory (either can be None, for no limit).
+    # Then they're sorted by block and written to a run (see write_run), and the set
+    # starts again.  blocks() merges the runs with whatever is still in memory.
+    #
+    # The runs are temporary files in a directory the store makes (in tempdir) the
+    # first time it needs one, and deletes in close() or, failing that, when the
+    # store is garbage collected or the program exits, so runs don't get left behind
+    # if the scan raises an exception or blocks() isn't read to the end.  A store in
+    # a worker process is given the main process's directory as rundir, so its runs
+    # are cleaned up with the rest;  it doesn't delete the directory itself.
+
+    # what a name costs in a set, over and above the bytes object itself:  the hash
+    # table slot (hash + pointer, in a table kept at most 60% full)
+    SET_ENTRY = 40
+
+    def __init__(self, max_names=None, max_bytes=None, tempdir=None, rundir=None):
+        self.max_names = max_names
+        self.max_bytes = max_bytes
+        self.tempdir = tempdir
+        self.runs = []
+        self._rundir = rundir
+        self._cleanup = None            # if we made the directory, a finalizer which removes it
+        self._names = set()
+        self._bytes = 0
+
+    # the directory the runs go in (made if need be)
+    def rundir(self):
+        if self._rundir is None:
+            self._rundir = tempfile.mkdtemp(prefix="authors-", dir=self.tempdir)
+            self._cleanup = weakref.finalize(self, _remove_rundir, self._rundir, os.getpid())
+        return self._rundir
+
+    def add(self, author):
+        self._add(_encode(author))
+
+    def _add(self, author):
+        if author in self._names:
+            return
+        self._names.add(author)
+        self._bytes += sys.getsizeof(author) + self.SET_ENTRY
+        if ((self.max_names and len(self._names) >= self.max_names)
+                or (self.max_bytes and self._bytes >= self.max_bytes)):
+            self.spill()
+
+    def update(self, authors):
+        for author in authors:
+            self._add(_encode(author))
+
+    def spill(self):
+        if self._names:
+            authors = map(_decode, self._names)
+            self.runs.append(write_run(sorted((block_key(author), author) for author in authors),
+                                       self.rundir()))
+        self._names = set()
+        self._bytes = 0
+
+    # Hand everything over (e.g., from a worker process to the main process) as
+    # a list of runs and a set of names, and start again empty
+    def take(self):
+        runs, names = self.runs, self._names
+        self.runs, self._names, self._bytes = [], set(), 0
+        return runs, names
+
+    # ... and take them back
+    def merge(self, runs, names):
+        self.runs.extend(runs)
+        for author in names:
+            self._add(author)
+
+    # The blocks, in block key order.  This empties the store
+    def blocks(self):
+        if not self.runs:
+            index = {}
+            for author in map(_decode, self._names):
+                index.setdefault(block_key(author), []).append(author)
+            self.take()
+            for key in sorted(index):
+                yield key, sorted(index[key])
+            return
+        self.spill()
+        runs, _ = self.take()
+        yield from merge_runs(runs)
+
+    # delete the runs, and the directory if it's ours
+    def close(self):
+        runs, _ = self.take()
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+        if self._cleanup is not None:
+            self._cleanup()
+            self._cleanup = None
+            self._rundir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# The blocks for any number of names, in block key order
+def blocks(authors : Iterable[str], limit=1000000, tempdir=None) -> Iterator[Tuple[str, List[str]]]:
+    with AuthorStore(max_names=limit, tempdir=tempdir) as store:
+        store.update(authors)
+        yield from store.blocks()
+
+# every cluster of possible duplicates, a block at a time
+def clusters(block_stream : Iterable[Tuple[str, List[str]]]) -> Iterator[List[str]]:
+    for _, members in block_stream:
+        if len(members) > 1:
+            yield from block_clusters(members)
+
+# the same for a collection of names
+def duplicate_clusters(authors : Iterable[str], limit=1000000, tempdir=None) -> Iterator[List[str]]:
+    return clusters(blocks(authors, limit, tempdir))
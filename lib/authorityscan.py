@@ -0,0 +1,221 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import Counter
+import functools
+import json
+
+from . import lcnafgender, ndjson, subjectterms
+
+# One pass over an LC ndjson download (LCSH, LCNAF ...) for any number of analyses.
+#
+# Each line is parsed once and handed to every Visitor in turn.  The file is
+# processed in pieces (in a pool of worker processes, if you like; see
+# ndjson.process), and each visitor collects whatever it wants from a piece
+# into a result which is sent back to the main process.  The results come back
+# in file order, where the visitor adds them to its output.
+#
+# So a Visitor has two halves:
+#
+#     piece() and visit() run wherever the piece is being processed (maybe in a
+#         worker process), so they can't write to files
+#     begin(), collect(), end() and close() run in the main process
+#
+# end() is only called if the whole file was scanned, so a visitor that writes its
+# output at the end (like GenderCounts) doesn't overwrite a good file with partial
+# results after an error.  close() is always called, to close files and so on.
+# If one visitor's visit() or collect() raises an exception, that visitor drops out
+# but the others carry on to the end, and then the exception is raised again.
+#
+# Visitors are sent to the worker processes with pickle.  Anything only the main
+# process needs, like an open output file, goes in an attribute whose name starts
+# with '_', which isn't sent.
+#
+# Usage:
+#
+#     visitors = [ authorityscan.SubjectTerms("subject-entries.txt"),
+#                  authorityscan.GenderErrors("lcnaf-gender-errors.csv") ]
+#     authorityscan.run("lcnaf.madsrdf.ndjson.gz", visitors, workers=8)
+
+class Record:
+
+    # One line of the file after json.loads.  memo is for anything worth
+    # working out once and sharing between visitors (like a GraphIndex)
+
+    __slots__ = ("data", "memo")
+
+    def __init__(self, data):
+        self.data = data
+        self.memo = {}
+
+class Visitor:
+
+    def __getstate__(self):
+        return { k : v for k, v in self.__dict__.items() if not k.startswith('_') }
+
+    # main process, before the scan
+    def begin(self):
+        pass
+
+    # a new, empty result for one piece of the file
+    def piece(self):
+        return []
+
+    # add one record (line_number counts from 0 at the start of the piece) to result
+    def visit(self, result, line_number, record):
+        pass
+
+    # main process:  add the result for a piece, whose first line is first_line
+    def collect(self, result, first_line):
+        pass
+
+    # main process, after the whole file has been scanned
+    def end(self):
+        pass
+
+    # main process, after the scan, whether or not it got to the end
+    def close(self):
+        pass
+
+class SubjectTerms(Visitor):
+
+    # The headings written by LCSH/scan-subjects-madsrdf-jsonld.py:  line number, LC id,
+    # MARC tag and heading.  If the file isn't in the format we expect, collect raises
+    # subjectterms.ScanError, after writing the lines before the one in error
+
+    def __init__(self, outputfile, type_list=None):
+        self.outputfile = outputfile
+        self.type_list = type_list or None
+
+    def begin(self):
+        self._out = open(self.outputfile, 'w', encoding='utf-8')
+
+    def piece(self):
+        return { "lines" : [], "error" : None }
+
+    def visit(self, result, line_number, record):
+        if result["error"] is not None:
+            return
+        try:
+            if (text := subjectterms.scan_record(record.data, self.type_list)) is not None:
+                result["lines"].append((line_number, text))
+        except subjectterms.ScanError as e:
+            result["error"] = e
+
+    def collect(self, result, first_line):
+        for line_number, text in result["lines"]:
+            print(f"{first_line+line_number+1:6} {text}", file=self._out)
+        if result["error"] is not None:
+            raise result["error"]
+
+    def close(self):
+        self._out.close()
+
+# lcnafgender.scan_graph, once per record however many visitors ask
+def _gender_scan(record):
+    if (result := record.memo.get("lcnafgender")) is None:
+        result = record.memo["lcnafgender"] = lcnafgender.scan_graph(record.data['@graph'])
+    return result
+
+class GenderCounts(Visitor):
+
+    # The gender counts written by LCNAF/lcnaf-gender.py
+
+    def __init__(self, detailfile="lcnaf-genders-detail.csv", simplefile="lcnaf-genders-simple.csv"):
+        self.detailfile = detailfile
+        self.simplefile = simplefile
+
+    def begin(self):
+        self._genders = Counter()
+
+    def piece(self):
+        return Counter()
+
+    def visit(self, result, line_number, record):
+        count, _ = _gender_scan(record)
+        if count is not None:
+            result[count] += 1
+
+    def collect(self, result, first_line):
+        self._genders.update(result)
+
+    def end(self):
+        lcnafgender.write_detail(self._genders, self.detailfile)
+        lcnafgender.write_simple(self._genders, self.simplefile)
+
+class GenderErrors(Visitor):
+
+    # The error listing written by LCNAF/lcnaf-gender-errors.py
+
+    def __init__(self, outputfile="lcnaf-gender-errors.csv", debug=False):
+        self.outputfile = outputfile
+        self.debug = debug
+
+    def begin(self):
+        self._out = open(self.outputfile, 'w', encoding='utf-8')
+
+    def visit(self, result, line_number, record):
+        _, error = _gender_scan(record)
+        if error is not None:
+            result += error if self.debug else error[:1]
+
+    def collect(self, result, first_line):
+        for line in result:
+            print(line, file=self._out)
+
+    def close(self):
+        self._out.close()
+
+# Parse each line of a piece of the file and hand it to every visitor.
+# Returns the number of lines, each visitor's result and, for a visitor whose
+# visit() raised an exception, the exception (or None).  A visitor isn't given
+# any more records after an exception
+def scan_lines(visitors, lines):
+    results = [ visitor.piece() for visitor in visitors ]
+    errors = [ None ] * len(visitors)
+    line_count = 0
+    for line_count, line in enumerate(lines, start=1):
+        record = Record(json.loads(line))
+        for i, (visitor, result) in enumerate(zip(visitors, results)):
+            if errors[i] is None:
+                try:
+                    visitor.visit(result, line_count - 1, record)
+                except Exception as error:
+                    errors[i] = error
+    return line_count, results, errors
+
+# Run all the visitors over an ndjson file (which may be gzipped) in one pass
+def run(filename, visitors, workers=1):
+    started = []
+    failed = {}         # visitor -> the exception raised by its collect()
+    try:
+        for visitor in visitors:
+            visitor.begin()
+            started.append(visitor)
+        first_line = 0
+        for line_count, results, errors in ndjson.process(filename, functools.partial(scan_lines, visitors), workers):
+            for visitor, result, error in zip(visitors, results, errors):
+                if visitor in failed:
+                    continue
+                try:
+                    # what it got before the error, then the error
+                    visitor.collect(result, first_line)
+                    if error is not None:
+                        raise error
+                except Exception as error:
+                    failed[visitor] = error
+            first_line += line_count
+        for visitor in visitors:
+            if visitor not in failed:
+                visitor.end()
+    finally:
+        for visitor in started:
+            visitor.close()
+    if failed:
+        raise next(iter(failed.values()))
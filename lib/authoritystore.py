@@ -0,0 +1,132 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import gzip
+import sqlite3
+import xml.etree.ElementTree as ET
+import zlib
+
+from pymarc import record_to_xml
+
+from . import mmapmarc
+
+# A local copy of the LC authority files, keyed by LCCN, so lccn-to-marcxml.py
+# can answer most requests without going to id.loc.gov (one request every 3
+# seconds, so a few thousand names takes hours).
+#
+# The store is built from one of the MARC bulk downloads at https://id.loc.gov/download/,
+# either MARCXML (e.g., lcnaf.both.xml.gz) or MARC 21 (.mrc).  The MADS/RDF ndjson
+# files which LCNAF/lcnaf-gender.py reads don't include the MARC record, so
+# they can't be used here.
+#
+# Each record is stored as a zlib-compressed <marc:record> element, keyed by
+# the normalized LCCN from the 010 (or the 001 if there's no 010), in an SQLite
+# file.  Building the store takes a while, but it only needs to be done when
+# LC publishes a new download.
+
+MARC_NS = "http://www.loc.gov/MARC21/slim"
+ET.register_namespace("marc", MARC_NS)
+
+BATCHSIZE = 10000
+
+# "n  90699999" -> "n90699999", i.e., the form used in id.loc.gov URLs
+def normalize_lccn(lccn : str) -> str:
+    # anything after a / is a revision or suffix, which id.loc.gov ignores
+    return "".join(lccn.split("/")[0].split())
+
+# the LCCN of a <marc:record> element
+def _xml_lccn(element):
+    control = None
+    for field in element:
+        if field.tag == f"{{{MARC_NS}}}datafield" and field.get("tag") == "010":
+            for subfield in field:
+                if subfield.get("code") == "a" and subfield.text:
+                    return normalize_lccn(subfield.text)
+        elif field.tag == f"{{{MARC_NS}}}controlfield" and field.get("tag") == "001":
+            control = field.text
+    return normalize_lccn(control) if control else None
+
+# yield (lccn, MARCXML string) for each record in a MARCXML file (which may be gzipped),
+# without reading the whole file into memory
+def read_marcxml(filename):
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as xml_input:
+        context = ET.iterparse(xml_input, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event == "end" and element.tag == f"{{{MARC_NS}}}record":
+                lccn = _xml_lccn(element)
+                if lccn:
+                    yield lccn, ET.tostring(element, encoding="unicode")
+                root.clear()        # otherwise every record stays attached to the collection
+
+# the same for a MARC 21 (ISO 2709) file
+def read_marc(filename):
+    for view in mmapmarc.readviews(filename):
+        lccn = None
+        if (field010 := view['010']) is not None and field010['a']:
+            lccn = normalize_lccn(field010['a'])
+        elif (field001 := view['001']) is not None:
+            lccn = normalize_lccn(field001.data)
+        if lccn:
+            # pymarc writes the namespace as the default, id.loc.gov uses the marc: prefix
+            element = ET.fromstring(record_to_xml(view.as_record(), namespace=True))
+            yield lccn, ET.tostring(element, encoding="unicode")
+
+def read_dump(filename):
+    if filename.endswith((".xml", ".xml.gz")):
+        return read_marcxml(filename)
+    return read_marc(filename)
+
+class AuthorityStore:
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS records (lccn TEXT PRIMARY KEY, marcxml BLOB)")
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    # the MARCXML for an LCCN, or None if it isn't in the store
+    def lookup(self, lccn):
+        row = self._db.execute("SELECT marcxml FROM records WHERE lccn = ?",
+                               (normalize_lccn(lccn),)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    # add (lccn, marcxml) pairs, replacing any records already in the store.
+    # Returns the number of records added.
+    def load(self, records):
+        # nothing is lost if a build is interrupted except the build itself, so don't wait for the disk
+        self._db.execute("PRAGMA synchronous = OFF")
+        count = 0
+        batch = []
+        for lccn, marcxml in records:
+            batch.append((lccn, zlib.compress(marcxml.encode("utf-8"))))
+            if len(batch) >= BATCHSIZE:
+                self._db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)", batch)
+                self._db.commit()
+                count += len(batch)
+                batch = []
+        self._db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)", batch)
+        self._db.commit()
+        self._db.execute("PRAGMA synchronous = FULL")
+        return count + len(batch)
+
+    def summary(self):
+        return f"Authority store {self.filename}: {self.hits} found, {self.misses} not found"
+
+    def close(self):
+        self._db.close()
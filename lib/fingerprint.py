@@ -0,0 +1,111 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import Counter
+
+# Fingerprints of headings (650 fields and so on):  a hashable key per field, the
+# same for any two fields which should count as duplicates.  Finding the duplicates
+# in a record is then one pass with a set instead of comparing every field with
+# every other.  There are two kinds of key:
+#
+#     letters_key      the letters of the alphabetic subfields, in lower case
+#                      (Utilities/remove-duplicates.py)
+#     subject_key      the first $a, $b, $c, $d, $v, $x, $y and $z, ignoring a
+#                      trailing dot (recordscan.py's duplicate subject check)
+#
+# A HeadingIndex counts how many records use each heading, so you can build a
+# catalog-wide frequency list in the same pass that looks for duplicates.
+
+# bytes.translate tables for letters_key:  A-Z to a-z, and delete anything that
+# isn't a letter.  Non-ASCII characters are dropped before the table is used
+LOWER_CASE = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz")
+NOT_LETTERS = bytes(c for c in range(256) if not (ord('a') <= c <= ord('z') or ord('A') <= c <= ord('Z')))
+
+SUBJECT_SUBFIELDS = ('a', 'b', 'c', 'd', 'v', 'x', 'y', 'z')
+
+# (code, value) for each subfield of a field.  pymarc 4 (and mmapmarc) fields have
+# a flat list of code, value, code, value ...; pymarc 5 fields have Subfield tuples
+def subfield_pairs(field):
+    subfields = field.subfields
+    if subfields and isinstance(subfields[0], str):
+        return zip(subfields[0::2], subfields[1::2])
+    return ((subfield.code, subfield.value) for subfield in subfields)
+
+# The alphabetic subfields run together, with everything but the letters a-z and A-Z
+# removed, in lower case:  the same as re.sub(r'[^a-zA-Z]', '', text).lower(), but
+# done by two table lookups.  The key is bytes
+def letters_key(field) -> bytes:
+    text = "".join([ value for code, value in subfield_pairs(field) if code.isalpha() ])
+    return text.encode('ascii', 'ignore').translate(LOWER_CASE, NOT_LETTERS)
+
+# The first value of each of codes (values which are empty don't count), with any
+# trailing dots removed, in the order of codes
+def subject_key(field, codes=SUBJECT_SUBFIELDS) -> tuple:
+    first = {}
+    for code, value in subfield_pairs(field):
+        if code not in first:
+            first[code] = value
+    return tuple([ (code, first[code].rstrip('.')) for code in codes if first.get(code) ])
+
+# The fields which duplicate a field earlier in the list
+def duplicates(fields, key=letters_key) -> list:
+    seen = set()
+    found = []
+    for field in fields:
+        k = key(field)
+        if k in seen:
+            found.append(field)
+        else:
+            seen.add(k)
+    return found
+
+# True if any two of the fields have the same key (stops at the first duplicate)
+def has_duplicates(fields, key=letters_key) -> bool:
+    seen = set()
+    for field in fields:
+        k = key(field)
+        if k in seen:
+            return True
+        seen.add(k)
+    return False
+
+class HeadingIndex:
+
+    # How many records use each heading, by key, along with the first field seen
+    # for each key, to show what the heading looks like
+
+    def __init__(self, key=letters_key):
+        self.key = key
+        self.counts = Counter()
+        self.examples = {}
+
+    # Count one record's fields (a heading used twice in a record counts once) and
+    # return the duplicates, like duplicates(fields, key)
+    def add(self, fields) -> list:
+        seen = set()
+        found = []
+        for field in fields:
+            k = self.key(field)
+            if k in seen:
+                found.append(field)
+                continue
+            seen.add(k)
+            if k not in self.examples:
+                self.examples[k] = field
+        self.counts.update(seen)
+        return found
+
+    # (count, example field) for each heading, most used first
+    def most_common(self, n=None):
+        return [ (count, self.examples[k]) for k, count in self.counts.most_common(n) ]
+
+    def write(self, filename):
+        with open(filename, 'w', encoding='utf-8') as output:
+            for count, field in self.most_common():
+                print(count, field, sep="\t", file=output)
@@ -10,7 +10,8 @@
 from typing import List
 import requests
 import xmltodict
-import time
+
+from . import httpcache
 
 ##############################################################
 # NOTE:  Goodreads has deprecated the API and is no longer
@@ -28,11 +29,16 @@ def enabled():
 # The Goodreads API returns deeply nested XML, so we have to do some
 # work to extract the few values we need, first converting to JSON.
 
+# Requests are at least REQUESTDELAY seconds apart (see ratelimit.py).  If session
+# is an httpcache.CachedSession, responses we've seen before come from the cache,
+# without the delay.
+
+REQUESTDELAY = 2
+
 def get_worknumber(session, author:str, title:str, debug=False):
-    time.sleep(2)
     url = f"https://www.goodreads.com/search/index.xml?key=MNlciatZGMcW92q6tRoQA"
     params = { 'q' : f"{author} {title}"}
-    response = session.get(url, params=params).text
+    response = httpcache.get(session, url, params=params, delay=REQUESTDELAY).text
     if debug:
         print(f"response in get_worknumber: {response}")
     if (results := xmltodict.parse(response)['GoodreadsResponse']['search']['results']):
@@ -47,9 +53,8 @@ def get_worknumber(session, author:str, title:str, debug=False):
         return None
 
 def get_seriesname(session, worknumber: str, debug=False):
-    time.sleep(2)
     url = f"https://www.goodreads.com/work/{worknumber}/series?format=xml&key=" + GOODREADS_API_KEY
-    response = session.get(url).text
+    response = httpcache.get(session, url, delay=REQUESTDELAY).text
     seriesworks = xmltodict.parse(response)['GoodreadsResponse']['series_works']
     if debug:
         print(f"seriesworks in get_seriesname:\n{seriesworks}")
@@ -0,0 +1,231 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import Counter
+import concurrent.futures
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from . import ratelimit
+
+# A persistent cache of HTTP responses, shared by goodreads.py, opac.py and
+# the Library of Congress fetchers in the Utilities folder.
+#
+# All of those sources are rate limited, so we wait seconds before every request.
+# Rerunning a check over the same catalog should mostly hit the cache instead,
+# which means no request AND no wait.  (The waiting is done by ratelimit.py.)
+#
+# Responses are stored in an SQLite file keyed by the full URL (including the
+# query parameters), except for the parameters in SECRET_PARAMS, like the
+# Goodreads API key, which are left out so they never get written to the file.
+# (A secret doesn't change the response, so this doesn't mix up responses.)
+# Each host has its own time-to-live (see DEFAULT_TTLS), and when the file
+# gets bigger than maxbytes, the least recently used responses are thrown away.
+#
+# Usage:
+#
+#     session = httpcache.CachedSession(httpcache.ResponseCache("http-cache.sqlite"))
+#     goodreads.get_worknumber(session, author, title)    # etc.
+#
+# and in library code, instead of time.sleep(n) followed by session.get(...):
+#
+#     response = httpcache.get(session, url, params=params, delay=n)
+#
+# which works with a plain requests.Session too, and waits for the rate limit
+# of the host (at least n seconds between requests) instead of sleeping.
+
+DEFAULT_CACHEFILE = "http-cache.sqlite"
+
+DAY = 24 * 60 * 60
+
+# time-to-live in seconds by host.  A host matches if it ends with the key
+DEFAULT_TTLS = {
+    "goodreads.com" : 30 * DAY,
+    "bibliocommons.com" : 7 * DAY,       # series information gets updated
+    "id.loc.gov" : 30 * DAY,
+    "loc.gov" : 30 * DAY,
+}
+DEFAULT_TTL = 7 * DAY
+
+# query parameters which are credentials, not part of the question
+SECRET_PARAMS = frozenset(("key", "api_key", "apikey", "access_token", "token", "secret", "password"))
+
+# Only responses that are a definite answer are cached -- not 429s or 5xx errors
+CACHEABLE_STATUS = (200, 404)
+
+class CachedResponse:
+
+    # Enough of a requests.Response for the code in this repository
+
+    from_cache = True
+
+    def __init__(self, url, status_code, content, encoding, headers):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url} (cached)", response=self)
+
+class ResponseCache:
+
+    def __init__(self, filename=DEFAULT_CACHEFILE, ttls=None, maxbytes=500 * 1024 * 1024):
+        self.filename = filename
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.maxbytes = maxbytes
+        self.stats = Counter()           # hits, misses, expired, stores, evictions
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY, host TEXT, status INTEGER, encoding TEXT, headers TEXT,
+            content BLOB, size INTEGER, fetched REAL, accessed REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl(self, host):
+        for suffix, seconds in self.ttls.items():
+            if host == suffix or host.endswith("." + suffix):
+                return seconds
+        return DEFAULT_TTL
+
+    # the cache key:  the URL as it would actually be requested, parameters included,
+    # but without any secret parameters (see SECRET_PARAMS)
+    @staticmethod
+    def key(url, params=None):
+        return redact(requests.Request("GET", url, params=params).prepare().url)
+
+    def lookup(self, url, params=None):
+        key = self.key(url, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT host, status, encoding, headers, content, size, fetched"
+                                   " FROM responses WHERE url = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            host, status, encoding, headers, content, size, fetched = row
+            if now - fetched > self.ttl(host):
+                self._db.execute("DELETE FROM responses WHERE url = ?", (key,))
+                self._size -= size
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE url = ?", (now, key))
+            self.stats['hits'] += 1
+        return CachedResponse(key, status, content, encoding, json.loads(headers))
+
+    def store(self, response, url, params=None):
+        if response.status_code not in CACHEABLE_STATUS:
+            return
+        key = self.key(url, params)
+        content = response.content
+        headers = json.dumps({ k : v for k, v in response.headers.items() if k.lower() == "content-type" })
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE url = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (key, urlsplit(key).hostname or "", response.status_code, response.encoding,
+                              headers, content, len(content), now, now))
+            self._size += len(content) - (old[0] if old else 0)
+            self.stats['stores'] += 1
+            if self._size > self.maxbytes:
+                self._evict()
+
+    # throw away the least recently used responses until we're comfortably under maxbytes
+    def _evict(self):
+        target = self.maxbytes * 0.9
+        for url, size in self._db.execute("SELECT url, size FROM responses ORDER BY accessed").fetchall():
+            if self._size <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._size -= size
+            self.stats['evictions'] += 1
+
+    def summary(self):
+        return (f"HTTP cache {self.filename}: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+                f"{self.stats['evictions']} evictions, {self._size / (1024 * 1024):.1f} MB")
+
+    def close(self):
+        self._db.close()
+
+# url without the query parameters in SECRET_PARAMS
+def redact(url):
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [ (name, value) for name, value in query if name.lower() not in SECRET_PARAMS ]
+    if len(kept) == len(query):
+        return url
+    return urlunsplit(parts._replace(query=urlencode(kept)))
+
+class CachedSession:
+
+    # Wraps a requests.Session (or makes one) so that get() is answered from
+    # the cache when possible.  Anything else (headers, cookies, close ...)
+    # goes straight to the wrapped session.
+
+    def __init__(self, cache, session=None):
+        self.cache = cache
+        self.session = session if session is not None else requests.Session()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.session.close()
+
+    # delay is the minimum number of seconds between requests to the host
+    # (see ratelimit.py), so a cache hit doesn't wait at all
+    def get(self, url, params=None, delay=None, **kwargs):
+        return submit(self, url, params=params, delay=delay, **kwargs).result()
+
+def _fetch(session, url, params, kwargs):
+    if isinstance(session, CachedSession):
+        response = session.session.get(url, params=params, **kwargs)
+        session.cache.store(response, url, params)
+        return response
+    return session.get(url, params=params, **kwargs)
+
+# For library code:  GET url, respecting the rate limit for its host, unless the
+# session is a CachedSession which already has the response.  delay, if given,
+# is the minimum number of seconds between requests to the host.
+# submit returns a concurrent.futures.Future right away, so you can do other
+# work (or ask other hosts) while the request waits its turn; get waits for it.
+def submit(session, url, params=None, delay=None, **kwargs):
+    if isinstance(session, CachedSession) and (response := session.cache.lookup(url, params)) is not None:
+        future = concurrent.futures.Future()
+        future.set_result(response)
+        return future
+    return ratelimit.scheduler().submit(url, delay, _fetch, session, url, params, kwargs)
+
+def get(session, url, params=None, delay=None, **kwargs):
+    return submit(session, url, params=params, delay=delay, **kwargs).result()
@@ -0,0 +1,72 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import pickle
+
+# An in-memory copy of the author_title_series_name view (see create_isfdb_views.sql)
+# so sf-seriescheck.py can look up series names without a query per record.
+#
+# The view is read once, and each (author, title) is normalized the way MySQL's
+# case-insensitive collation would compare it.  The result can be saved to a
+# snapshot file, so later runs don't have to touch the database at all.
+
+SNAPSHOT_VERSION = 2
+
+# lower case, ignoring leading and trailing spaces.  Spaces inside a value count, as
+# they do in MySQL.  This isn't exactly the collation:  an accent-insensitive one
+# (e.g., utf8mb4_0900_ai_ci) also treats accented and unaccented letters as the same,
+# and MySQL doesn't ignore leading spaces, but the values we look up come from MARC
+# subfields, which don't start with spaces
+def normalize(author : str, title : str) -> str:
+    # \x1f can't appear in either value, so it's a safe separator
+    return author.strip().casefold() + "\x1f" + title.strip().casefold()
+
+class SeriesIndex:
+
+    def __init__(self, series=None):
+        self.series = series if series is not None else {}    # normalized key -> series name
+
+    def __len__(self):
+        return len(self.series)
+
+    def add(self, author, title, series_name):
+        # like readfirstrow, the first row for an author/title wins
+        self.series.setdefault(normalize(author, title), series_name)
+
+    # returns the series name, or None if ISFDB doesn't know the author/title
+    # (or if the view's series name is NULL)
+    def lookup(self, author, title):
+        return self.series.get(normalize(author, title))
+
+    # like readfirstrow on the view:  (author, title, series name) if ISFDB knows the
+    # author/title, even if the series name is NULL or empty, otherwise None
+    def row(self, author, title):
+        key = normalize(author, title)
+        return (author, title, self.series[key]) if key in self.series else None
+
+    def save(self, filename):
+        with open(filename, 'wb') as snapshot:
+            pickle.dump((SNAPSHOT_VERSION, self.series), snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as snapshot:
+            version, series = pickle.load(snapshot)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{filename} is an old ISFDB snapshot, please rebuild it")
+        return cls(series)
+
+    # table is a mydb.Table for the author_title_series_name view
+    @classmethod
+    def from_table(cls, table):
+        index = cls()
+        for author, title, series_name in table.readrow():
+            if author and title:
+                index.add(author, title, series_name)
+        return index
@@ -0,0 +1,143 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import Counter
+import json
+
+# The gender analysis of the LCNAF done by LCNAF/lcnaf-gender.py (counting
+# gender values) and LCNAF/lcnaf-gender-errors.py (listing unacceptable ones),
+# in one place so both come out of a single pass over the file.  (The passes
+# themselves are run by authorityscan.py.)  See LCNAF/README.md for what's
+# counted and why.
+#
+# Each line of the file is one record, a JSON-LD object whose '@graph' is a list
+# of nodes.  The gender of a person is given by id, and the value for the id is
+# in another node of the same graph, so instead of searching the graph for
+# every id, each record's nodes are indexed by id once.
+
+acceptable = [ "male", "males", "man", "men", "female", "females", "woman", "women", "not known"]
+
+# strip parenthetical label and spaces, convert to lower case,
+# then check if gender is in acceptable list
+def gender_fail(gender_value):
+    t = gender_value.strip()
+    if t.startswith("("):
+        pos = t.find(")") + 1
+        t = t[pos:].lstrip()
+    return t.lower() not in acceptable
+
+# For output in an Excel-compatible .csv file
+def quote(s):
+    return '"' + s.replace('"', '""') + '"'
+
+# Convert any id which is local to the record (not a URL)
+# to the fixed value '@local'
+def convert_local(id):
+    return id if id.startswith("http") else "$local"
+
+# Collapse a list of identical items into a one item list
+def collapse(alist):
+    return [ alist[0] ] if all([x == alist[0] for x in alist]) else alist
+
+class GraphIndex:
+
+    # The nodes of one record's graph by id (the first node with an id wins,
+    # as it did when the graph was searched from the front), along with the
+    # things both analyses look for
+
+    def __init__(self, whole_graph):
+        self.graph = whole_graph
+        self.nodes = {}
+        self.uri = "no uri"
+        self.person = None            # the node with the gender attribute
+        self.personal_name = False    # is this record a PersonalName authority?
+        found_uri = False
+        for element in whole_graph:
+            if (id := element.get('@id')) is not None:
+                self.nodes.setdefault(id, element)
+                if not found_uri and id.startswith("http://id.loc.gov/authorities/names/n"):
+                    self.uri = id
+                    found_uri = True
+            if (self.person is None
+                    and ("http://xmlns.com/foaf/0.1/Person" in element.get('@type', ""))
+                    and element.get('madsrdf:gender', None)
+                ):
+                self.person = element
+            # If specified, element type is a list of strings
+            if ((typelist := element.get('@type'))
+                    and ('madsrdf:PersonalName' in typelist)
+                    and ('madsrdf:Authority' in typelist)
+                ):
+                self.personal_name = True
+
+    # The value of a gender id is given in the node of the graph which
+    # has an id attribute equal to the gender id attribute
+    def decode_key(self, gender_id):
+        if (part := self.nodes.get(gender_id)) is None:
+            print("Can't find gender id", gender_id)
+            print(json.dumps(self.graph, indent=2))
+            raise ValueError("Gender id not found")
+        if gender_value := (part.get("rdfs:label") or part.get("madsrdf:authoritativeLabel")):
+            return gender_value
+        print("Can't get value from ", part)
+        raise ValueError("Can't get value from gender object")
+
+# The value of a gender attribute can either be a one-item dictionary
+# (with key = '@id') or a list of one-item dictionaries.  The value in
+# the dictionary is NOT the gender value itself, but a key to it.
+# Returns the sorted ids and their values
+def gender_keys(gender_attribute, index):
+    if isinstance(gender_attribute, list):
+        sorted_keys = sorted( [ x['@id'] for x in gender_attribute ] )
+    else:
+        sorted_keys = [ gender_attribute['@id'] ]
+    return sorted_keys, [ index.decode_key(id) for id in sorted_keys ]
+
+# Analyse one record's graph.  Returns the (source, gender value) to count, or None if the
+# record isn't a personal name, and None or, if the gender is in error, a line for the errors
+# file and a line of debugging information (the nodes involved)
+def scan_graph(whole_graph):
+    index = GraphIndex(whole_graph)
+    if not index.personal_name:
+        return None, None
+    if index.person is None:
+        return ("", "$Gender missing"), None      # no gender, no problem
+
+    sorted_keys, gender_value_list = gender_keys(index.person['madsrdf:gender'], index)
+    gender_key_list = [ convert_local(id) for id in sorted_keys ]
+    count = ( '+'.join(collapse(gender_key_list)), '+'.join(collapse(gender_value_list)) )
+
+    if not any( [ gender_fail(gv) for gv in gender_value_list ] ):
+        return count, None
+    error = " , ".join([ quote(index.uri), quote(count[0]), quote(count[1]) ])
+    debugstring = " ".join([ str(index.person) ] + [ str(index.nodes[id]) for id in sorted_keys ])
+    return count, (error, debugstring)
+
+# the same for one line of the LCNAF
+def scan_record(line):
+    # each line in the file is a separate JSON-LD object
+    # representing an single name authority record
+    return scan_graph(json.loads(line)['@graph'])
+
+# recount genders counter without first part of key
+def simple_counts(genders):
+    simple = Counter()
+    for (k1, k2), cnt in genders.items():
+        simple[k2] += cnt
+    return simple
+
+def write_detail(genders, filename):
+    with open(filename, 'w', encoding='utf-8') as outf:
+        for (k1, k2), cnt in genders.items():
+            print(quote(k1), quote(k2), cnt, sep=" , ", file=outf)
+
+def write_simple(genders, filename):
+    with open(filename, 'w', encoding='utf-8') as outf:
+        for k, cnt in simple_counts(genders).items():
+            print(quote(k), cnt, sep=" , ", file=outf)
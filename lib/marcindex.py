@@ -0,0 +1,100 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import os
+
+from . import mmapmarc
+
+# A sidecar index for a MARC file, so you don't have to read the file from
+# byte 0 every time you want a particular record or a particular slice of records.
+#
+# The index for "catalog.mrc" is "catalog.mrc.idx".  It's a text file.  The first
+# line records the size and modification time of the MARC file, so we can tell
+# when the index is out of date, and each following line is:
+#
+#     byte offset <tab> length <tab> 001 control number (or "")
+#
+# Use Utilities/marc-index.py to build or refresh index files.
+
+INDEX_SUFFIX = ".idx"
+INDEX_HEADER = "# marc-index 1"
+
+def index_path(filename):
+    return filename + INDEX_SUFFIX
+
+def _signature(filename):
+    st = os.stat(filename)
+    return f"{INDEX_HEADER} {st.st_size} {st.st_mtime_ns}"
+
+class MarcIndex:
+
+    def __init__(self, filename, entries):
+        self.filename = filename
+        self.entries = entries       # list of (offset, length, control number)
+        self._bycontrol = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    # byte range (start, end) covering records first up to (not including) last,
+    # suitable for mymarc.readfromfile
+    def byte_range(self, first=0, last=None):
+        last = len(self.entries) if last is None else min(last, len(self.entries))
+        if first >= last:
+            return (0, 0)
+        offset, _, _ = self.entries[first]
+        end_offset, end_length, _ = self.entries[last-1]
+        return (offset, end_offset + end_length)
+
+    # split the records into n runs of (nearly) equal numbers of records
+    # and return the byte range for each run
+    def ranges(self, n):
+        total = len(self.entries)
+        cuts = sorted({ total * i // n for i in range(n + 1) })
+        return [ self.byte_range(a, b) for a, b in zip(cuts, cuts[1:]) ]
+
+    # (offset, length) for the record whose 001 is bibnumber, or None
+    def find(self, bibnumber):
+        if self._bycontrol is None:
+            self._bycontrol = {}
+            for offset, length, control in self.entries:
+                if control:
+                    self._bycontrol.setdefault(control, (offset, length))
+        return self._bycontrol.get(bibnumber)
+
+def build_index(filename):
+    entries = []
+    for view in mmapmarc.readviews(filename):
+        control = view['001']
+        entries.append((view.offset, view.length, control.data.strip() if control else ""))
+    with open(index_path(filename), 'w', encoding='utf-8') as idx:
+        print(_signature(filename), file=idx)
+        for offset, length, control in entries:
+            print(offset, length, control, sep='\t', file=idx)
+    return MarcIndex(filename, entries)
+
+def is_fresh(filename):
+    try:
+        with open(index_path(filename), encoding='utf-8') as idx:
+            return idx.readline().rstrip('\n') == _signature(filename)
+    except FileNotFoundError:
+        return False
+
+# Return the MarcIndex for a file.  If the index is missing or out of date,
+# rebuild it if build is True, otherwise return None
+def load_index(filename, build=True):
+    if not is_fresh(filename):
+        return build_index(filename) if build else None
+    entries = []
+    with open(index_path(filename), encoding='utf-8') as idx:
+        next(idx)       # skip header
+        for line in idx:
+            offset, length, control = line.rstrip('\n').split('\t')
+            entries.append((int(offset), int(length), control))
+    return MarcIndex(filename, entries)
@@ -0,0 +1,175 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import mmap
+
+from pymarc import Field, Record
+from pymarc.marc8 import marc8_to_unicode
+
+# A fast, lazy reader for MARC (ISO 2709) files.
+#
+# pymarc.MARCReader builds a complete Record for every record in the file,
+# decoding every field and every subfield, even if the caller only looks at
+# a few tags.  This reader memory-maps the file, parses the leader and the
+# directory in place, and only decodes a field when somebody asks for it.
+#
+# A RecordView looks enough like a pymarc Record for the console applications
+# in this repository:  view['245'], view.get_fields('650', '651'), view.subjects(),
+# view.leader and so on.  If you need a real Record, call view.as_record().
+
+LEADER_LEN = 24
+DIRECTORY_ENTRY_LEN = 12
+END_OF_FIELD = 0x1E
+END_OF_RECORD = 0x1D
+SUBFIELD_INDICATOR = b'\x1f'
+
+SUBJECT_TAGS = ('600', '610', '611', '630', '648', '650', '651', '653',
+                '654', '655', '656', '657', '658', '662', '690', '691',
+                '696', '697', '698', '699')
+
+class RecordView:
+
+    # buf is anything that supports slicing to bytes (an mmap, bytes, ...)
+    # and offset/length locate the record inside it
+
+    def __init__(self, buf, offset, length):
+        self._buf = buf
+        self.offset = offset
+        self.length = length
+        self.leader = buf[offset:offset + LEADER_LEN].decode('ascii')
+        self._utf8 = self.leader[9] == 'a'
+        base_address = int(self.leader[12:17])
+        self._base = offset + base_address
+        # tag -> list of (offset, length) into buf, in directory order
+        self._directory = {}
+        self._order = []
+        directory = buf[offset + LEADER_LEN:self._base - 1]
+        for pos in range(0, len(directory) - DIRECTORY_ENTRY_LEN + 1, DIRECTORY_ENTRY_LEN):
+            entry = directory[pos:pos + DIRECTORY_ENTRY_LEN]
+            tag = entry[0:3].decode('ascii')
+            location = (self._base + int(entry[7:12]), int(entry[3:7]))
+            self._directory.setdefault(tag, []).append(location)
+            self._order.append((tag, location))
+        self._cache = {}    # (offset, length) -> decoded Field
+
+    def _decode(self, tag, location):
+        if (field := self._cache.get(location)) is not None:
+            return field
+        offset, length = location
+        data = self._buf[offset:offset + length]
+        if data and data[-1] == END_OF_FIELD:
+            data = data[:-1]
+        if tag < '010' and tag.isdigit():
+            field = Field(tag=tag, data=data.decode('utf-8' if self._utf8 else 'iso8859-1'))
+        else:
+            subs = data.split(SUBFIELD_INDICATOR)
+            indicators = (subs[0].decode('ascii') + '  ')[:2]
+            subfields = list()
+            for subfield in subs[1:]:
+                if not subfield:
+                    continue
+                value = subfield[1:]
+                subfields.append(subfield[0:1].decode('ascii', 'replace'))
+                subfields.append(value.decode('utf-8') if self._utf8 else marc8_to_unicode(value, True))
+            field = Field(tag=tag, indicators=list(indicators), subfields=subfields)
+        self._cache[location] = field
+        return field
+
+    # the same semantics as pymarc 4:  the first field with this tag, or None
+    def __getitem__(self, tag):
+        if (locations := self._directory.get(tag)):
+            return self._decode(tag, locations[0])
+        return None
+
+    def __contains__(self, tag):
+        return tag in self._directory
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def get(self, tag, default=None):
+        field = self[tag]
+        return default if field is None else field
+
+    def get_fields(self, *tags):
+        if not tags:
+            return self.fields
+        return [ self._decode(tag, location) for tag, location in self._order if tag in tags ]
+
+    @property
+    def fields(self):
+        return [ self._decode(tag, location) for tag, location in self._order ]
+
+    def tags(self):
+        return [ tag for tag, _ in self._order ]
+
+    def subjects(self):
+        return self.get_fields(*SUBJECT_TAGS)
+
+    # the raw bytes of the record, exactly as they appear in the file
+    def as_marc(self):
+        return bytes(self._buf[self.offset:self.offset + self.length])
+
+    def as_record(self):
+        record = Record()
+        record.leader = self.leader
+        for field in self.fields:
+            record.add_field(field)
+        return record
+
+# yield (start, length) for each record in buf between start and end
+def record_spans(buf, start=0, end=None):
+    end = len(buf) if end is None else end
+    pos = start
+    while pos < end:
+        try:
+            length = int(buf[pos:pos + 5])
+        except ValueError:
+            length = 0
+        if (length < LEADER_LEN or pos + length > end
+                or buf[pos + length - 1] != END_OF_RECORD):
+            # leader is damaged, so fall back to looking for the record terminator
+            terminator = buf.find(bytes([END_OF_RECORD]), pos, end)
+            length = (terminator + 1 if terminator != -1 else end) - pos
+        yield pos, length
+        pos += length
+
+# Split a MARC file into (start, end) byte ranges of roughly equal size,
+# each beginning just after a record terminator, so every record falls
+# entirely inside one range.  Used to hand out work to parallel workers.
+def chunk_ranges(filename, nchunks):
+    with open(filename, 'rb') as marc_input:
+        try:
+            buf = mmap.mmap(marc_input.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # empty file
+            return []
+        with buf:
+            size = len(buf)
+            boundaries = [0]
+            for i in range(1, nchunks):
+                terminator = buf.find(bytes([END_OF_RECORD]), max(boundaries[-1], size * i // nchunks))
+                if terminator == -1:
+                    break
+                if terminator + 1 > boundaries[-1]:
+                    boundaries.append(terminator + 1)
+            if boundaries[-1] < size:
+                boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+# Read a MARC file and yield a RecordView for each record.  The file stays
+# mapped until the generator is exhausted (or closed).
+def readviews(filename, start=0, end=None):
+    with open(filename, 'rb') as marc_input:
+        try:
+            buf = mmap.mmap(marc_input.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # can't map an empty file
+            return
+        with buf:
+            for offset, length in record_spans(buf, start, end):
+                yield RecordView(buf, offset, length)
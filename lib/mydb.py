@@ -7,8 +7,15 @@
 #    carryonwilliams@gmail.com
 #
 
+from collections import Counter
+import contextlib
 import itertools
-from pymarc import Record, Field
+import queue
+import threading
+import time
+from pymarc import Record
+
+from . import tagdata
 
 import mysql.connector
 
@@ -25,11 +32,27 @@ def dbescape(s):
 class Connection:
 
     # a moderate amount of argy bargy to check if the connection
-    # fell over and reconnect if it did
+    # fell over and reconnect if it did.
+    # Checking costs a round trip to the server, so we only check if the
+    # connection has been idle for more than check_after seconds.
+    # Note that mysql-connector's cursor() checks the connection too (it
+    # pings the server), so the one-shot queries (fetchall, execute,
+    # executemany below) share one buffered cursor per connection instead
+    # of asking for a new one every time.
+    #
+    # If a read fails because the connection dropped, fetchall reconnects
+    # and tries once more.  Writes are NOT retried:  anything uncommitted
+    # is gone with the old connection, so the error is passed on to you.
+    # allow_local_infile is only needed for Table.loadfile (LOAD DATA LOCAL INFILE)
 
-    def __init__(self, schema=None):
+    def __init__(self, schema=None, allow_local_infile=False, check_after=60):
         self.schema = schema
+        self.allow_local_infile = allow_local_infile
+        self.check_after = check_after
+        self.reconnects = 0
+        self._cursor = None
         self._connection = self._open()
+        self._lastused = time.monotonic()
 
     def _open(self):
         if not self.schema:
@@ -37,23 +60,172 @@ class Connection:
         return mysql.connector.connect(user='graeme', password=MYSQL_PASSWORD,
             host='127.0.0.1',
             database=self.schema,
-            connection_timeout=36000)
+            connection_timeout=36000,
+            allow_local_infile=self.allow_local_infile)
+
+    def reconnect(self):
+        # blow away existing connection, it's dead, Jim
+        self._cursor = None
+        try:
+            self._connection.close()
+        except mysql.connector.Error:
+            pass
+        self._connection = self._open()
+        self.reconnects += 1
 
     def get_connection(self):
-        if not self._connection.is_connected():
-            # blow away existing connection, it's dead, Jim
-            self._connection = self._open()
+        now = time.monotonic()
+        if now - self._lastused > self.check_after and not self._connection.is_connected():
+            self.reconnect()
+        self._lastused = now
         return self._connection
 
-    def cursor(self):
-        return self.get_connection().cursor()
+    def cursor(self, **kwargs):
+        try:
+            return self.get_connection().cursor(**kwargs)
+        except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+            self.reconnect()
+            return self._connection.cursor(**kwargs)
+
+    # the shared cursor for one-shot queries
+    def _shared_cursor(self):
+        connection = self.get_connection()
+        if self._cursor is None:
+            self._cursor = connection.cursor(buffered=True)
+        return self._cursor
+
+    # all the rows of a query, reconnecting and trying once more if the connection dropped
+    def fetchall(self, operation, params=None):
+        try:
+            cursor = self._shared_cursor()
+            cursor.execute(operation, params)
+            return cursor.fetchall()
+        except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+            self.reconnect()
+            cursor = self._shared_cursor()
+            cursor.execute(operation, params)
+            return cursor.fetchall()
+
+    # INSERT, LOAD DATA and so on:  no retry (see above).  Returns the row count
+    def execute(self, operation, params=None):
+        cursor = self._shared_cursor()
+        cursor.execute(operation, params)
+        return cursor.rowcount
+
+    def executemany(self, operation, seq_params):
+        cursor = self._shared_cursor()
+        cursor.executemany(operation, seq_params)
+        return cursor.rowcount
+
+    # A cursor of its own for a query whose rows are read a few at a time (so the
+    # shared cursor can be used in between), with the query already executed.
+    # If the connection dropped, reconnect and execute it once more.  Once rows
+    # are being read, a dropped connection is an error
+    def execute_stream(self, operation, params=None, **kwargs):
+        try:
+            cursor = self.cursor(**kwargs)
+            cursor.execute(operation, params)
+        except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+            self.reconnect()
+            cursor = self._connection.cursor(**kwargs)
+            cursor.execute(operation, params)
+        return cursor
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._cursor = None
+        self._connection.close()
+
+class ConnectionPool:
+
+    # A fixed-size pool of Connections (above) which several threads can share.
+    # Each thread borrows a connection for as long as it needs it:
+    #
+    #     with pool.connection() as cnx:
+    #         row = mydb.Table(cnx, "author_title_series_name").readfirstrow(query=...)
+    #
+    # If all the connections are in use, the thread waits for one to come back
+    # (for at most timeout seconds, if timeout is given).  stats() reports how
+    # many times connections were borrowed, how many times a thread had to
+    # wait, and how many times a connection had to be reopened.
+
+    def __init__(self, schema, size=4, timeout=None, **kwargs):
+        self.schema = schema
+        self.size = size
+        self.timeout = timeout
+        self._kwargs = kwargs           # passed on to Connection
+        self._idle = queue.LifoQueue()  # most recently used first, so it's least likely to be stale
+        self._all = []
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self.closed = False
+
+    def _checkout(self):
+        if self.closed:
+            raise RuntimeError("ConnectionPool is closed")
+        try:
+            cnx = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = len(self._all) < self.size
+                if create:
+                    self._all.append(None)      # reserve a slot
+            if create:
+                try:
+                    cnx = Connection(schema=self.schema, **self._kwargs)
+                except Exception:
+                    with self._lock:
+                        self._all.remove(None)
+                    raise
+                with self._lock:
+                    self._all[self._all.index(None)] = cnx
+            else:
+                with self._lock:
+                    self._counts['waits'] += 1
+                cnx = self._idle.get(timeout=self.timeout)
+        with self._lock:
+            self._counts['checkouts'] += 1
+        return cnx
+
+    @contextlib.contextmanager
+    def connection(self):
+        cnx = self._checkout()
+        try:
+            yield cnx
+        finally:
+            if self.closed:
+                cnx.close()         # the pool was closed while this was borrowed
+            else:
+                self._idle.put(cnx)
+
+    def stats(self):
+        with self._lock:
+            connections = [ cnx for cnx in self._all if cnx is not None ]
+            return { 'connections' : len(connections),
+                     'checkouts' : self._counts['checkouts'],
+                     'waits' : self._counts['waits'],
+                     'reconnects' : sum(cnx.reconnects for cnx in connections) }
+
+    # close the idle connections; connections which are borrowed are closed when
+    # they come back.  After this, connection() raises RuntimeError
+    def close(self):
+        with self._lock:
+            self.closed = True
+            while True:
+                try:
+                    cnx = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                cnx.close()
+            self._all = []
 
 class Table:
 
     def __init__(self, cnx, name):
-        # cnx should be a Connection object (above) so you get
-        # automatic reconnection on failure, but a vanilla
-        # mysql connection will probably also work fine
+        # cnx should be a Connection object (above):  the queries
+        # use its shared cursor and automatic reconnection
         self.cnx = cnx
         self.name = name      
 
@@ -61,10 +233,33 @@ class Table:
     # a separate database record for each field.
     # tagData is all the subfields glommed together (e.g., "$aSmith, Bob$d1995-$fsomething else")
     # If you want a different table  format, change this function and/or readpymarc.
-    def readmarc(self, query=""):
-        cursor = self.cnx.cursor()
+    #
+    # If batchsize is given, rows are streamed from the server through an unbuffered
+    # cursor, batchsize rows at a time, so we never hold the whole table in memory
+    # and don't pay for a call per row.  Don't run other queries on the same
+    # connection until the generator is finished.
+    # A dropped connection is retried when the query is sent (see
+    # Connection.execute_stream), but not part way through the rows.
+    def readmarc(self, query="", batchsize=None):
         querycmd = f"SELECT bibNumber, tag, indicator, tagData FROM {self.name} " + query
-        cursor.execute(querycmd)
+        if batchsize:
+            cursor = self.cnx.execute_stream(querycmd, buffered=False)
+            finished = False
+            try:
+                while (rows := cursor.fetchmany(batchsize)):
+                    yield from rows
+                finished = True
+            finally:
+                if finished:
+                    cursor.close()
+                else:
+                    # the caller stopped early (or something raised), so the rest of the
+                    # result is still coming from the server and closing the cursor would
+                    # raise "Unread result found".  Reading the rest of a big table could
+                    # take minutes, so drop the connection and open a new one instead
+                    self.cnx.reconnect()
+            return
+        cursor = self.cnx.execute_stream(querycmd)
         row = cursor.fetchone()
         while row is not None:
             yield row
@@ -73,43 +268,18 @@ class Table:
     # returns a tuple consisting of the bibnumber from the database and a standard
     # pymarc Record.  If you switch to a different table format you can use
     # anything for bibnumber as long as it's unique -OR- just return ''.
-    def readpymarc(self, query=""):
+    def readpymarc(self, query="", batchsize=None, tags=None):
         # This piece of magic is just to re-assemble the MARC record from its separate
         # fields assuming that the first element of the row returned by readmarc uniquely
         # defines the MARC record.
         # If your database format uses a single database record for the MARC record,
         # you won't need this outer loop.
-        for _, dbrecordlist in itertools.groupby(self.readmarc(query), lambda x : x[0]):
+        # tagData is decoded by tagdata.decode_rows; if tags is given (e.g. ['001', '245'])
+        # fields with any other tag are skipped without being decoded.
+        for bibnumber, dbrecordlist in itertools.groupby(self.readmarc(query, batchsize), lambda x : x[0]):
             pyrecord = Record()
-            bibnumber = ''
-            for bn, tag, indicators, tagData in dbrecordlist:
-                bibnumber = bn  # doesn't matter that we do this every time
-                if tag[0:2] == "00":        # fixed format header field
-                    pyrecord.add_field(
-                        Field(tag = tag, data = tagData)
-                        )
-                else:                       # ordinary field
-                    subfields = list()
-                    merge = ""
-                    # tagData is all of the subfields glommed together, separated by $
-                    # The [1:] index is used to skip the initial None.
-                    for subfield in tagData.split('$')[1:]:
-                        if len(subfield) < 2:     # special case for $c$nn.nn 
-                            merge = subfield + "$"
-                            continue
-                        sf = merge + subfield
-                        # this next line because pymarc Field.subfields is a list of 
-                        # alternating tags and values like:
-                        #    [ 'a', 'Turtles', 'b', 'The Real Story', 'c', 'by Bob Smith' ]
-                        subfields.extend([sf[0], sf[1:]])
-                        merge = ""
-                    pyrecord.add_field(
-                        Field(
-                            tag = tag,
-                            indicators = list(indicators),  # turns string into list
-                            subfields = subfields
-                            )
-                        )
+            for aField in tagdata.decode_rows([ row[1:] for row in dbrecordlist ], tags):
+                pyrecord.add_field(aField)
             yield bibnumber, pyrecord
 
 ######################################################################
@@ -122,50 +292,117 @@ class Table:
         querycmd = f"SELECT {columns} from {self.name} {query}"
         if debug:
             print(f"Querycmd in readfirstrow is {querycmd}")
-        with self.cnx.cursor() as cursor:
-            cursor.execute(querycmd)
-            all_values = cursor.fetchall()
+        # if the connection dropped, fetchall reopens it and tries once more
+        all_values = self.cnx.fetchall(querycmd)
         return all_values[0] if all_values else None
 
     def readrow(self, query="", debug=False):
-        cursor = self.cnx.cursor()
         querycmd = f"SELECT * from {self.name} " + query
         if debug:
             print(f"Querycmd in readrow is {querycmd}")
-        cursor.execute(querycmd)
+        cursor = self.cnx.execute_stream(querycmd)
         row = cursor.fetchone()
         while row is not None:
             yield row
             row = cursor.fetchone() 
 
+    # one row at a time -- for more than a handful of rows, use bulkloader (below)
     def addmarc(self, bibnum, tag, indicator, tagData):
-        cursor = self.cnx.cursor()
-        tagDataX = dbescape(tagData)
         insertcmd = f"INSERT into {self.name} (bibnumber, tag, indicator, tagData)" \
-            f" VALUES ('{bibnum}', '{tag}', '{indicator}', {tagDataX})"
-        # print("Table insertcmd is", insertcmd)
-        cursor.execute(insertcmd)
+            " VALUES (%s, %s, %s, %s)"
+        self.cnx.execute(insertcmd, (bibnum, tag, indicator, tagData))
+        self.cnx.commit()
+
+    # Bulk loading:  see BulkLoader (below) for executemany batches, or write
+    # the rows to a file with write_loadfile and load it with loadfile, which
+    # is faster still but needs LOAD DATA LOCAL INFILE enabled on the server
+    # and Connection(..., allow_local_infile=True) on the client.
+
+    def bulkloader(self, batchsize=1000, commitevery=100000):
+        return BulkLoader(self, batchsize, commitevery)
+
+    def loadfile(self, filename):
+        loadcmd = f"LOAD DATA LOCAL INFILE {dbescape(filename)} INTO TABLE {self.name}" \
+            " FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'" \
+            " (bibnumber, tag, indicator, tagData)"
+        rowcount = self.cnx.execute(loadcmd)
         self.cnx.commit()
-        cursor.close()
+        return rowcount
 
     def checkfieldvalue(self, field_name, field_value):
-        cursor = self.cnx.cursor()
         fv = dbescape(field_value)
         querycmd = f"SELECT {field_name} FROM {self.name} where {field_name} = {fv}"
         try:
-            cursor.execute(querycmd)
+            row = self.cnx.fetchall(querycmd)
         except Exception as e:
             print(f"Exception in checkfieldvalue with {querycmd}")
             return False
             # raise e
-        row = cursor.fetchall()
-        cursor.close()
         return bool(row)
 
     def uniquevaluesfromtag(self, tag_name):
-        cursor = self.cnx.cursor()
         querycmd = f"SELECT distinct tagData from {self.name} where tag = '{tag_name}'"
-        cursor.execute(querycmd)
-        result = cursor.fetchall()   # list, NOT a generator
-        cursor.close()
-        return result
+        return self.cnx.fetchall(querycmd)   # list, NOT a generator
+
+# escape a value for a LOAD DATA file with the default MySQL escaping
+_loadfile_escapes = str.maketrans({ "\\" : "\\\\", "\t" : "\\t", "\n" : "\\n", "\r" : "\\r", "\0" : "\\0" })
+
+# write (bibnumber, tag, indicator, tagData) rows to a file for Table.loadfile
+def write_loadfile(rows, outfile):
+    for row in rows:
+        print(*[ str(value).translate(_loadfile_escapes) for value in row ], sep="\t", file=outfile)
+
+class BulkLoader:
+
+    # Collects (bibnumber, tag, indicator, tagData) rows and INSERTs them with a
+    # parameterized executemany, batchsize rows at a time, committing every
+    # commitevery rows.  Use it as a context manager so the last rows get
+    # written and committed:
+    #
+    #     with table.bulkloader() as loader:
+    #         for row in rows:
+    #             loader.add(*row)
+
+    def __init__(self, table, batchsize=1000, commitevery=100000):
+        self.table = table
+        self.batchsize = batchsize
+        self.commitevery = commitevery
+        self.insertcmd = f"INSERT into {table.name} (bibnumber, tag, indicator, tagData)" \
+            " VALUES (%s, %s, %s, %s)"
+        self.rows = []
+        self.uncommitted = 0
+        self.total = 0
+
+    def add(self, bibnum, tag, indicator, tagData):
+        self.rows.append((bibnum, tag, indicator, tagData))
+        if len(self.rows) >= self.batchsize:
+            self.flush()
+
+    def addmany(self, rows):
+        for row in rows:
+            self.add(*row)
+
+    def flush(self):
+        if self.rows:
+            # not retried if the connection drops:  the uncommitted rows went with it
+            self.table.cnx.executemany(self.insertcmd, self.rows)
+            self.uncommitted += len(self.rows)
+            self.total += len(self.rows)
+            self.rows = []
+        if self.uncommitted >= self.commitevery:
+            self.commit()
+
+    def commit(self):
+        self.table.cnx.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
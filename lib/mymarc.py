@@ -1,5 +1,5 @@
 # 
-#    Version:  0.2.0  4/10/25
+#    Version:  0.3.0  10/18/26
 # 
 #    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
 #
@@ -10,6 +10,8 @@
 import pymarc
 
 from . import mydb   # for recordgenerator wrapper
+from . import mmapmarc
+from . import marcindex
 
 #####  Handling names from 100 and 700 fields  #####
 #
@@ -40,10 +42,83 @@ def namefromMARC(subfield_a, subfield_d, flip = False) -> tuple:      # subfield
     else:
         return t
 
+#####  Looking up fields by tag  #####
+
+class FieldMap:
+
+    # A pymarc Record's fields indexed by tag, built with one pass over the record.
+    # pymarc's record['245'] and record.get_fields('650') search the whole field list
+    # every time, so a dozen checks on a record means a dozen passes over it.
+    #
+    # A FieldMap answers the same questions:  fieldmap['245'] is the first 245 field
+    # or None (pymarc 4 semantics), get_fields and subjects return fields in record
+    # order, and anything else (leader, fields, as_marc ...) is passed to the record.
+
+    __slots__ = ("record", "_bytag")
+
+    def __init__(self, record):
+        self.record = record
+        self._bytag = {}
+        for field in record.fields:
+            if (same_tag := self._bytag.get(field.tag)) is None:
+                self._bytag[field.tag] = [ field ]
+            else:
+                same_tag.append(field)
+
+    def __getitem__(self, tag):
+        if (same_tag := self._bytag.get(tag)):
+            return same_tag[0]
+        return None
+
+    def __contains__(self, tag):
+        return tag in self._bytag
+
+    def __iter__(self):
+        return iter(self.record.fields)
+
+    def __getattr__(self, name):
+        return getattr(self.record, name)
+
+    def get(self, tag, default=None):
+        field = self[tag]
+        return default if field is None else field
+
+    def get_fields(self, *tags):
+        if not tags:
+            return self.record.fields
+        if len(tags) == 1:
+            return list(self._bytag.get(tags[0], ()))
+        # several tags:  only go through the record if it has any of them
+        if not any(tag in self._bytag for tag in tags):
+            return []
+        return [ field for field in self.record.fields if field.tag in tags ]
+
+    def subjects(self):
+        return self.get_fields(*mmapmarc.SUBJECT_TAGS)
+
+# The record, ready for looking up lots of tags:  a FieldMap for a pymarc Record.
+# An mmapmarc.RecordView already has an index by tag (and only decodes the fields
+# you ask for), so it's returned as it is
+def indexed(record):
+    if isinstance(record, (mmapmarc.RecordView, FieldMap)):
+        return record
+    return FieldMap(record)
+
 #####  Handling input streams (file or DB)  #####
 
 # wrapper so reading MARC files looks the same as reading the database:
-def readfromfile(filename):
+# if lazy is True, yield mmapmarc.RecordView objects, which only decode
+# the fields you actually look at, instead of full pymarc Records.
+# start and end are byte offsets, e.g. from mmapmarc.chunk_ranges
+def readfromfile(filename, lazy=False, start=0, end=None):
+    if lazy:
+        for aView in mmapmarc.readviews(filename, start, end):
+            yield "", aView
+        return
+    if start or end is not None:
+        for aView in mmapmarc.readviews(filename, start, end):
+            yield "", pymarc.Record(data=aView.as_marc())
+        return
     with open(filename, 'rb') as marc_input:
         for aRecord in pymarc.MARCReader(marc_input):
             # if you have a MARC field you want to use to identify the record
@@ -51,12 +126,46 @@ def readfromfile(filename):
             bibnumber = ""
             yield bibnumber, aRecord
 
+# for incremental scans (see resultstore.py):  the bytes of each record, exactly as
+# they are in the file, along with an mmapmarc.RecordView, so the record only has to
+# be decoded (with decode, below) if the result for those bytes isn't already known
+def readrawfromfile(filename, start=0, end=None):
+    for aView in mmapmarc.readviews(filename, start, end):
+        yield aView.as_marc(), aView
+
+# the record for a view from readrawfromfile, the same as readfromfile would give you
+def decode(aView, lazy=False):
+    return aView if lazy else pymarc.Record(data=aView.as_marc())
+
+# read records first up to (not including) last, counting from 0, using the
+# sidecar index (see marcindex.py) so we don't have to read the records before
+# first.  Handy for resuming a run that fell over at record N.
+def readrange(filename, first=0, last=None, lazy=False):
+    start, end = marcindex.load_index(filename).byte_range(first, last)
+    return readfromfile(filename, lazy, start, end)
+
+# random access by control number (001), using the sidecar index.
+# Returns a pymarc Record or None.  If you're looking up a lot of
+# records, load the index once and pass it in.
+def readbibnumber(filename, bibnumber, index=None):
+    index = index or marcindex.load_index(filename)
+    if not (location := index.find(bibnumber)):
+        return None
+    offset, length = location
+    with open(filename, 'rb') as marc_input:
+        marc_input.seek(offset)
+        return pymarc.Record(data=marc_input.read(length))
+
 # depending on the input, make a generator out of a MARC
 # input file or a database table
-def recordgenerator(inputfile:str, dbtable:str):
+# lazy only applies to files and batchsize only applies to tables (see mydb.readmarc).
+# tags also only applies to tables:  if it's given, the records only have fields with
+# those tags, and the other fields aren't decoded (see mydb.readpymarc).  A lazy file
+# record already only decodes the fields you ask for.
+def recordgenerator(inputfile:str, dbtable:str, lazy=False, batchsize=None, tags=None):
     if inputfile:
-        return readfromfile(inputfile)
+        return readfromfile(inputfile, lazy)
     else:
         input_cnx = mydb.Connection(schema="world")
         input_table = mydb.Table(input_cnx, dbtable)
-        return input_table.readpymarc(query="")
\ No newline at end of file
+        return input_table.readpymarc(query="", batchsize=batchsize, tags=tags)
@@ -0,0 +1,184 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import deque
+import contextlib
+import gzip
+import io
+import mmap
+import multiprocessing
+import os
+import queue
+import threading
+
+# Helpers for reading the big ndjson (one JSON document per line) downloads
+# from id.loc.gov in pieces, so that several processes can parse one file.
+#
+# line_ranges splits a file into byte ranges which each start at the beginning
+# of a line, the same way mmapmarc.chunk_ranges splits a MARC file at record
+# terminators.  read_lines reads the lines in one range as bytes (json.loads
+# is happy with bytes, and it saves decoding every line twice).
+#
+# The downloads come gzipped, and unzipping the LCNAF takes tens of gigabytes
+# of disk.  open_binary reads a .gz file directly, decompressing it in a
+# separate thread (zlib lets go of the GIL while it works) so decompression
+# overlaps the JSON parsing.  A gzip file can't be split into byte ranges, so
+# for parallel processing, batches() hands out groups of lines instead, and
+# ordered_map keeps only a few batches in flight at once.
+#
+# process() puts all that together:  it calls a function on every piece of a
+# file (in a pool of worker processes, if you like) and gives back the results
+# in file order.
+
+BLOCKSIZE = 1024 * 1024
+
+# Size of the pieces an uncompressed file is split into.  With more than one
+# worker there are at least four pieces per worker, so a slow piece doesn't
+# hold everybody up
+CHUNKSIZE = 64 * 1024 * 1024
+# Number of lines per piece when reading a .gz file
+BATCHLINES = 5000
+
+# Split a file into (start, end) byte ranges of roughly equal size, each
+# beginning just after a newline, so every line falls entirely inside one range
+def line_ranges(filename, nchunks):
+    with open(filename, 'rb') as ndjson_input:
+        try:
+            buf = mmap.mmap(ndjson_input.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # empty file
+            return []
+        with buf:
+            size = len(buf)
+            boundaries = [0]
+            for i in range(1, nchunks):
+                newline = buf.find(b'\n', max(boundaries[-1], size * i // nchunks))
+                if newline == -1:
+                    break
+                if newline + 1 > boundaries[-1]:
+                    boundaries.append(newline + 1)
+            if boundaries[-1] < size:
+                boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+# yield each line (as bytes, including the newline) between start and end
+def read_lines(filename, start=0, end=None):
+    with open(filename, 'rb') as ndjson_input:
+        ndjson_input.seek(start)
+        position = start
+        for line in ndjson_input:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line
+
+class _GzipThreadReader(io.RawIOBase):
+
+    # A raw binary stream of the decompressed contents of a .gz file.  A
+    # background thread decompresses blocks into a small queue, so at most
+    # a few blocks are ever waiting in memory
+
+    def __init__(self, filename, blocks=8):
+        self._blocks = queue.Queue(blocks)
+        self._stop = threading.Event()
+        self._current = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._decompress, args=(filename,), daemon=True)
+        self._thread.start()
+
+    def _decompress(self, filename):
+        try:
+            with gzip.open(filename, 'rb') as gz_input:
+                while not self._stop.is_set():
+                    block = gz_input.read(BLOCKSIZE)
+                    self._put(block)
+                    if not block:
+                        return
+        except Exception as e:      # passed on to the reader
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._current and not self._eof:
+            block = self._blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self._eof = True
+            self._current = memoryview(block)
+        count = min(len(buffer), len(self._current))
+        buffer[:count] = self._current[:count]
+        self._current = self._current[count:]
+        return count
+
+    def close(self):
+        self._stop.set()
+        super().close()
+
+# Open an ndjson file, or a gzipped one (.gz), for reading lines as bytes
+def open_binary(filename):
+    if filename.endswith(".gz"):
+        return io.BufferedReader(_GzipThreadReader(filename), BLOCKSIZE)
+    return open(filename, 'rb')
+
+# group lines into lists of batchsize lines
+def batches(lines, batchsize=10000):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batchsize:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Like pool.imap(func, jobs), but only takes a job from jobs when fewer than
+# window jobs are waiting, so a generator reading a huge file isn't read into
+# memory all at once.  (imap's task feeder reads ahead as fast as it can.)
+def ordered_map(pool, func, jobs, window):
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.apply_async(func, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def _range_job(job):
+    func, filename, start, end = job
+    return func(read_lines(filename, start, end))
+
+def _batch_job(job):
+    func, lines = job
+    return func(lines)
+
+# Call func(lines) for each piece of an ndjson file (which may be gzipped), where
+# lines is an iterable of the lines in the piece as bytes, and yield the results
+# in file order.  With workers > 1, the pieces are processed in a pool of that many
+# processes, so func has to be something pickle can send to them:  a function defined
+# at the top level of a module, or a functools.partial of one.
+def process(filename, func, workers=1):
+    with (multiprocessing.Pool(workers) if workers > 1 else contextlib.nullcontext() as pool,
+          open_binary(filename) if filename.endswith(".gz") else contextlib.nullcontext() as inf):
+        if inf is not None:
+            jobs = ( (func, batch) for batch in batches(inf, BATCHLINES) )
+            yield from ordered_map(pool, _batch_job, jobs, workers * 2) if pool else map(_batch_job, jobs)
+        else:
+            nchunks = max(workers * 4 if workers > 1 else 1, os.path.getsize(filename) // CHUNKSIZE)
+            jobs = [ (func, filename, start, end) for start, end in line_ranges(filename, nchunks) ]
+            yield from pool.imap(_range_job, jobs) if pool else map(_range_job, jobs)
@@ -8,7 +8,8 @@
 #
 
 import re
-import time
+
+from . import httpcache, ratelimit
 
 #--------------------------
 #
@@ -16,6 +17,8 @@ import time
 #
 # -------------------------
 
+# minimum seconds between requests (see ratelimit.py).  If session is an
+# httpcache.CachedSession, pages we've seen before come from the cache without waiting
 DEFAULTDELAY = 3
 
 # 'old' format is all digits with the system number at the end
@@ -82,11 +85,11 @@ def searchgenerator(session, query, requestdelay = DEFAULTDELAY, startpage = 1,
     bibset = set()       # used to avoid duplicates.
 
     while True:
-        time.sleep(requestdelay)
         url = query + f"&pagination_page={page}"
         if debug:
             print("--- url is", url)
-        rt = session.get(url, cookies=cookies).text
+        # search results aren't cached, but they still wait for the rate limit
+        rt = ratelimit.scheduler().call(url, requestdelay, session.get, url, cookies=cookies).text
 
         for m in re.finditer(r'(?:/item/show/(\d*))', rt, flags=re.S):
             bibnumber = extractbibnum(m)
@@ -115,9 +118,8 @@ def searchgenerator(session, query, requestdelay = DEFAULTDELAY, startpage = 1,
 # This generator yields (i.e., generates) MARC fields one at a time
 def getmarcgenerator(session, libcode, bibnumber, requestdelay=DEFAULTDELAY):
 
-    time.sleep(requestdelay)
     url = f"https://{libcode}.bibliocommons.com/item/catalogue_info/{bibnumber}"
-    rt = session.get(url).text
+    rt = httpcache.get(session, url, delay=requestdelay).text
 
     mtag, pos = html_find(rt, r'"marcTag"><str', 0)
     while mtag is not None:
@@ -139,9 +141,8 @@ def getmarcgenerator(session, libcode, bibnumber, requestdelay=DEFAULTDELAY):
 
 def checkNoveListseries(session, libcode, bibnumber, requestdelay=DEFAULTDELAY) -> str:
 
-    time.sleep(requestdelay)
     bn = bibnumformat(bibnumber, "new")
     url = f"https://gateway.bibliocommons.com/v2/libraries/{libcode}/bibs/{bn}/seriesinfo"
-    rj = session.get(url).json()
+    rj = httpcache.get(session, url, delay=requestdelay).json()
 
     return rj["seriesInfo"].get("seriesTitle")
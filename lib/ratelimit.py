@@ -0,0 +1,141 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import threading
+from urllib.parse import urlsplit
+
+# One place to respect the rate limits of the sites we scrape, instead of a
+# time.sleep() in front of every request.
+#
+# The Scheduler runs an asyncio event loop in a background thread, with a
+# token bucket for each host.  submit() hands it a request and returns a
+# concurrent.futures.Future straight away, so the caller can get on with
+# parsing MARC records (or ask a different host) while the request waits its
+# turn.  Requests to one host are spaced at least that host's interval apart;
+# requests to different hosts don't wait for each other.  When a host says
+# it's had enough (429 Too Many Requests, or a 5xx), pause() holds back every
+# request to it for a while, not just the one which is going to be retried.
+#
+# Most code doesn't use this directly:  httpcache.get() and httpcache.submit()
+# send cache misses through the shared scheduler().
+
+# minimum seconds between requests, by host.  A host matches if it ends with the key
+DEFAULT_INTERVALS = {
+    "goodreads.com" : 2,
+    "bibliocommons.com" : 3,
+    "id.loc.gov" : 3,             # as required by id.loc.gov/robots.txt
+    "loc.gov" : 5,                # robots.txt allows scraping at 5 second intervals
+}
+DEFAULT_INTERVAL = 1
+
+def default_interval(host):
+    for suffix, seconds in DEFAULT_INTERVALS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return seconds
+    return DEFAULT_INTERVAL
+
+class TokenBucket:
+
+    # Allows burst requests at once, then one every interval seconds, except
+    # that nothing goes until paused_until (in event loop time) has passed.
+    # Waiters are served in the order they arrive (the lock is fair).
+
+    def __init__(self, interval, burst=1):
+        self.interval = interval
+        self.burst = burst
+        self.tokens = burst
+        self.updated = None
+        self.paused_until = 0
+        self._lock = asyncio.Lock()
+
+    # no requests for the next seconds seconds
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, asyncio.get_running_loop().time() + seconds)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            if self.updated is not None and self.interval > 0:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.interval)
+                self.updated = loop.time()
+                self.tokens = 1
+            while (wait := self.paused_until - loop.time()) > 0:
+                await asyncio.sleep(wait)
+                self.updated = loop.time()
+            self.tokens -= 1
+
+class Scheduler:
+
+    # workers is the number of threads that actually make (blocking) requests
+
+    def __init__(self, intervals=None, workers=8):
+        self.intervals = intervals or {}      # host -> interval, overrides DEFAULT_INTERVALS
+        self._buckets = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="ratelimit")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ratelimit", daemon=True)
+        self._thread.start()
+
+    def _bucket(self, host, interval):
+        # only ever called in the event loop thread, so no locking needed
+        if (bucket := self._buckets.get(host)) is None:
+            if interval is None:
+                interval = self.intervals.get(host, default_interval(host))
+            bucket = self._buckets[host] = TokenBucket(interval)
+        elif interval is not None and interval > bucket.interval:
+            bucket.interval = interval
+        return bucket
+
+    async def _run(self, host, interval, fn):
+        await self._bucket(host, interval).acquire()
+        return await self._loop.run_in_executor(self._executor, fn)
+
+    # Call fn(*args, **kwargs) as soon as the rate limit for url's host allows.
+    # interval, if given, is the minimum number of seconds between requests to the host.
+    # Returns a concurrent.futures.Future.
+    def submit(self, url, interval, fn, *args, **kwargs):
+        host = urlsplit(url).hostname or url
+        return asyncio.run_coroutine_threadsafe(
+            self._run(host, interval, functools.partial(fn, *args, **kwargs)), self._loop)
+
+    # the same, but wait for the result
+    def call(self, url, interval, fn, *args, **kwargs):
+        return self.submit(url, interval, fn, *args, **kwargs).result()
+
+    # Hold back every request to url's host for seconds seconds (e.g., after a 429).
+    # Requests already waiting for the host wait too, whichever thread submitted them
+    def pause(self, url, seconds):
+        host = urlsplit(url).hostname or url
+        self._loop.call_soon_threadsafe(lambda: self._bucket(host, None).pause(seconds))
+
+    def close(self):
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# the Scheduler shared by everything in this process
+def scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            atexit.register(_scheduler.close)
+        return _scheduler
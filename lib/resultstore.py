@@ -0,0 +1,148 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from collections import Counter
+import hashlib
+import os
+import pickle
+import sqlite3
+import urllib.parse
+
+# The results of checking each record of a MARC file, kept from one run to the next
+# so that a nightly export, where hardly any records have changed, only needs the
+# changed records checked again.  Used by recordscan.py and LCSH/subjects-check.py
+# with --results.
+#
+# Results are stored in an SQLite file keyed by a hash of the record's bytes, exactly
+# as they are in the file, so any change to a record means a new key.  A result is
+# whatever the program wants to remember about the record (anything pickle can
+# handle), and has to be enough to produce the same output as checking the record.
+#
+# The results depend on the code that produced them (and, e.g., the LCSH terms), so
+# the store has a signature:  a hash of the source files and anything else the
+# program passes in.  If the signature changes, the old results are thrown away.
+#
+# At the end of a complete run, close(prune=True) throws away the results for
+# records which weren't in the file this time, so the store doesn't keep growing.
+#
+# Usage:
+#
+#     store = resultstore.ResultStore("results.sqlite", resultstore.signature(__file__, ...))
+#     for raw, view in mymarc.readrawfromfile(filename):
+#         key = store.key(raw)
+#         store.keep(key)
+#         if (result := store.get(key)) is None:
+#             result = check(view)
+#             store.put(key, result)
+#         ... output result ...
+#     store.close(prune=True)
+
+# hash of the contents of files (like the program itself) and of strings
+def signature(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if os.path.isfile(part):
+            with open(part, 'rb') as contents:
+                while (block := contents.read(1024 * 1024)):
+                    digest.update(block)
+        else:
+            digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class ResultStore:
+
+    BATCH = 10000       # results (and kept keys) written to the file at a time
+
+    # readonly is for worker processes, which look results up while the main process
+    # writes them (the file is in WAL mode, so readers don't block the writer)
+    def __init__(self, filename, signature, readonly=False):
+        self.filename = filename
+        self.stats = Counter()           # hits, misses, stores, pruned
+        self._new = []
+        self._kept = []
+        self.readonly = readonly
+        if readonly:
+            uri = "file:" + urllib.parse.quote(os.path.abspath(filename)) + "?mode=ro"
+            self._db = sqlite3.connect(uri, uri=True)
+            return
+        self._db = sqlite3.connect(filename)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results (hash BLOB PRIMARY KEY, result BLOB) WITHOUT ROWID")
+        self._db.execute("CREATE TEMP TABLE kept (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+        if row is None or row[0] != signature:
+            self._db.execute("DELETE FROM results")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (signature,))
+        self._db.commit()
+
+    # the key for a record:  a hash of its bytes
+    @staticmethod
+    def key(raw):
+        return hashlib.blake2b(raw, digest_size=16).digest()
+
+    def get(self, key):
+        row = self._db.execute("SELECT result FROM results WHERE hash = ?", (key,)).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return pickle.loads(row[0])
+
+    def put(self, key, result):
+        self._new.append((key, pickle.dumps(result, pickle.HIGHEST_PROTOCOL)))
+        self.stats['stores'] += 1
+        if len(self._new) >= self.BATCH:
+            self.flush()
+
+    # the record with this key is still in the file, so keep its result
+    def keep(self, key):
+        self._kept.append((key,))
+        if len(self._kept) >= self.BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.readonly:
+            return          # see take
+        if self._new:
+            self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?)", self._new)
+            self._new = []
+        if self._kept:
+            self._db.executemany("INSERT OR IGNORE INTO kept VALUES (?)", self._kept)
+            self._kept = []
+        self._db.commit()
+
+    # A worker process (readonly) can't write what it found, so it hands its new results
+    # and kept keys to the main process, which takes them with merge
+    def take(self):
+        taken = (self._new, self._kept, self.stats)
+        self._new, self._kept, self.stats = [], [], Counter()
+        return taken
+
+    def merge(self, new, kept, stats):
+        self._new.extend(new)
+        self._kept.extend(kept)
+        self.stats.update(stats)
+        if len(self._new) >= self.BATCH or len(self._kept) >= self.BATCH:
+            self.flush()
+
+    def summary(self):
+        return (f"Result store {self.filename}: {self.stats['hits']} records unchanged, "
+                f"{self.stats['misses']} checked, {self.stats['pruned']} no longer in the file")
+
+    # prune only after a run that read the whole file, or the results for the
+    # records it didn't get to are thrown away
+    def close(self, prune=False):
+        self.flush()
+        if prune:
+            cursor = self._db.execute("DELETE FROM results WHERE hash NOT IN (SELECT hash FROM kept)")
+            self.stats['pruned'] = cursor.rowcount
+            self._db.commit()
+        self._db.close()
@@ -0,0 +1,72 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+# Writing out the statistics of a run (e.g., recordscan.py --stats) for people, as
+# JSON, and for monitoring, as a Prometheus textfile (the format read by the
+# node_exporter textfile collector).
+#
+# The statistics are a dict like this:
+#
+#     { "records": 123456, "scan_seconds": 78.9, "records_per_second": 1564.7,
+#       "peak_memory_bytes": 123456789,
+#       "checks": [ { "check": "no 001", "calls": 123456, "matches": 12, "seconds": 0.5 }, ... ] }
+#
+# where every item other than "checks" is a number (or None, if it isn't known).
+# A check can have other items besides these (e.g., recordscan.py's
+# "matches_all_records"), which only go in the JSON
+
+# Peak resident memory in bytes of this process and of the largest of its finished
+# child processes (e.g., a multiprocessing.Pool), or None if we can't tell
+def peak_memory():
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+def write_json(stats, filename):
+    with open(filename, 'w', encoding='utf-8') as output:
+        json.dump(stats, output, indent=2)
+        output.write("\n")
+
+def _label(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+def _metric(lines, name, help_text, kind, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        label_text = "{" + ",".join(f"{k}={_label(v)}" for k, v in labels.items()) + "}" if labels else ""
+        lines.append(f"{name}{label_text} {value!r}")
+
+# The Prometheus text format.  The file is written under another name and renamed,
+# so the collector never reads half a file
+def write_prometheus(stats, filename, prefix):
+    lines = []
+    for key, value in stats.items():
+        if key != "checks" and isinstance(value, (int, float)) and not isinstance(value, bool):
+            _metric(lines, f"{prefix}_{key}", key.replace("_", " "), "gauge", [ ({}, value) ])
+    checks = stats.get("checks", [])
+    for field, kind in (("calls", "counter"), ("matches", "counter"), ("seconds", "counter")):
+        _metric(lines, f"{prefix}_check_{field}_total", f"check {field}", kind,
+                [ ({ "check" : check["check"] }, check[field]) for check in checks ])
+    temporary = filename + ".tmp"
+    with open(temporary, 'w', encoding='utf-8') as output:
+        output.write("\n".join(lines) + "\n")
+    os.replace(temporary, filename)
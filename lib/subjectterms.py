@@ -0,0 +1,70 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+# Extracting the subject headings from the LC MADS/RDF downloads (one JSON-LD
+# record per line), as done by LCSH/scan-subjects-madsrdf-jsonld.py.  The
+# output for each record is the LC id, the MARC tag and the heading, which is
+# what LCSH/build-lists.py reads.
+
+class ScanError(Exception):
+
+    # The LC file isn't in the format we expect.  item is the JSON which
+    # caused the problem, for printing
+
+    def __init__(self, message, item):
+        super().__init__(message, item)
+        self.message = message
+        self.item = item
+
+def process_primary(item, type_list = None):
+    # This is the primary node in the graph
+    if type_list and all([atype not in item['@type'] for atype in type_list]):
+        # either type_list is None or we don't want this node type
+        return None
+
+    id = item['@id'].split('/')[-1]
+
+    # handle difference between in JSON format between LCSH and LCNAF
+
+    key = item.get('bflc:marcKey', 'xxx')  # 'xxx' if no marcKey value
+    if isinstance(key, str):
+        pass
+    elif isinstance(key, list):
+        key = key[0]
+    else:
+        # unexpected JSON format
+        raise ScanError("Error parsing marcKey", item)
+
+    item_value = item['madsrdf:authoritativeLabel']
+    if isinstance(item_value, str):
+        pass
+    elif isinstance(item_value, dict):
+        item_value = item_value['@value']
+    elif isinstance(item_value, list):
+        item_value = item_value[0]
+    else:
+        # unexpected JSON format
+        raise ScanError("Error parsing authoritativeLabel", item)
+    return f"{id:16} {key[:3]} {item_value}"
+
+# The output line for one record, i.e., one line of the input file once it's been
+# through json.loads (without the line number), or None if the entry is
+# deprecated/deleted or not one of the types we want
+def scan_record(data, type_list = None):
+    graph = data['@graph']
+    primary_id = "http://id.loc.gov" + data['@id']
+    for item in graph:
+        if ('madsrdf:DeprecatedAuthority' in item['@type']
+            or 'madsrdf:deletionNote' in item):
+            # skip this entry entirely
+            return None
+     #   elif 'bflc:marcKey' in item or 'identifiers:lccn' in item:
+        elif item['@id'] == primary_id:
+            return process_primary(item, type_list)
+    raise ScanError("Couldn't find a primary node", graph)
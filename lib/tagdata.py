@@ -0,0 +1,63 @@
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from pymarc import Field
+
+# Decoding tagData, i.e., all the subfields of a field glommed together
+# like "$aSmith, Bob$d1995-$fsomething else", the way fields are stored in
+# the per-field database tables described in mydb.py.
+#
+# decode is the loop that used to live in mydb.Table.readpymarc, including
+# the special case for "$c$nn.nn", moved here so the utilities can share it.
+# Building the pymarc Fields costs far more than splitting the strings (see
+# benchmarks/tagdata-benchmark.py), so the saving comes from decode_rows,
+# which lets the caller skip the fields it doesn't need before doing any
+# work on them.
+
+# tagData -> pymarc subfield list of alternating codes and values like:
+#    [ 'a', 'Turtles', 'b', 'The Real Story', 'c', 'by Bob Smith' ]
+def decode(tagData : str) -> list:
+    subfields = list()
+    merge = ""
+    # the [1:] skips whatever comes before the first $ (normally nothing)
+    for subfield in tagData.split('$')[1:]:
+        if len(subfield) < 2:       # special case for $c$nn.nn
+            merge = subfield + "$"
+            continue
+        sf = merge + subfield
+        subfields.extend([sf[0], sf[1:]])
+        merge = ""
+    return subfields
+
+# the reverse of decode, for writing fields to the database
+def encode(subfields) -> str:
+    return "".join([ f"${subfields[i]}{subfields[i+1]}" for i in range(0, len(subfields), 2) ])
+
+# Decode a batch of (tag, indicators, tagData) rows into pymarc Fields.
+# If tags is given, rows for any other tag are skipped without being decoded.
+def decode_rows(rows, tags=None):
+    wanted = None if tags is None else frozenset(tags)
+    fields = []
+    for tag, indicators, tagData in rows:
+        if wanted is not None and tag not in wanted:
+            continue
+        if tag[0:2] == "00":        # fixed format header field
+            fields.append(Field(tag=tag, data=tagData))
+        else:
+            fields.append(Field(tag=tag, indicators=list(indicators), subfields=decode(tagData)))
+    return fields
+
+# The reverse of mydb.Table.readpymarc:  turn a pymarc Record (or an
+# mmapmarc.RecordView) into (bibnumber, tag, indicators, tagData) rows
+def record_rows(bibnumber : str, record):
+    for aField in record.fields:
+        if aField.tag[0:2] == "00":
+            yield bibnumber, aField.tag, "", aField.data
+        else:
+            yield bibnumber, aField.tag, "".join(aField.indicators), encode(aField.subfields)
@@ -0,0 +1,161 @@
+#
+#    Version:  0.2.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+from array import array
+import mmap
+import struct
+import sys
+import zlib
+
+# The LC subject terms used by LCSH/subjects-check.py, compiled into one
+# binary file so that checking a small MARC file doesn't start by reading
+# two big text files and cleaning up every line.
+#
+# build-termdb.py reads the term lists written by build-lists.py, applies
+# strip_punctuation to each term (as subjects-check.py used to do every run)
+# and writes each list as a TermTable:
+#
+#     the terms, sorted and UTF-8 encoded, one after the other (the "blob")
+#     an array of offsets, so term i is blob[offsets[i]:offsets[i+1]]
+#     a hash table of term numbers, with slots for twice as many terms,
+#         using zlib.crc32 of the UTF-8 as the hash and linear probing
+#
+# subjects-check.py memory-maps the file and answers "term in table" by
+# looking in the hash table, without ever making a Python set.  So loading
+# takes no time, the terms take up the size of the file instead of hundreds
+# of MB of str objects, and every process checking records shares the one
+# copy in the page cache.  (Python's own str hash changes from run to run,
+# which is why the hash is crc32.)
+#
+# benchmarks/termdb-benchmark.py compares memory and lookup time with a set.
+
+MAGIC = b"LCTERMDB"
+TERMDB_VERSION = 2
+
+# version, byte order and number of tables, then for each table:
+# number of terms, number of hash slots, and the file positions of the offsets,
+# the hash slots and the blob
+HEADER = struct.Struct("<8sI8sI")
+TABLE_HEADER = struct.Struct("<QQQQQ")
+
+# Strip some punctuation from a subfield (or a term)
+def strip_punctuation(subfield : str) -> str:
+    t = subfield.strip()
+    t = t.rstrip(',')
+    # strip trailing . unless it's an initial, like "Smith, A."
+    if len(t) > 2 and t[-3].isalnum():
+        t = t.rstrip('.')
+    return t
+
+# the terms in a term list written by build-lists.py, one per line
+def read_terms(filename):
+    with open(filename, encoding="utf-8") as termfile:
+        return { strip_punctuation(phrase) for phrase in termfile }
+
+def _encode(term : str) -> bytes:
+    return term.encode("utf-8", "surrogatepass")
+
+class TermTable:
+
+    # A read-only set of strings in a memory-mapped file.  Supports in, len and
+    # iteration (in sorted order of the UTF-8), which is all subjects-check.py needs
+
+    def __init__(self, buf, count, nslots, offsets_pos, slots_pos, blob_pos):
+        self._count = count
+        self._mask = nslots - 1
+        view = memoryview(buf)
+        self._offsets = view[offsets_pos:offsets_pos + 4 * (count + 1)].cast("I")
+        self._slots = view[slots_pos:slots_pos + 4 * nslots].cast("I")
+        self._blob = view[blob_pos:blob_pos + self._offsets[count]]
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, term):
+        key = _encode(term)
+        offsets = self._offsets
+        slots = self._slots
+        blob = self._blob
+        slot = zlib.crc32(key) & self._mask
+        while (number := slots[slot]):
+            # slots hold term number + 1, so that 0 means empty
+            if blob[offsets[number - 1]:offsets[number]] == key:
+                return True
+            slot = (slot + 1) & self._mask
+        return False
+
+    def __iter__(self):
+        offsets = self._offsets
+        for i in range(self._count):
+            yield bytes(self._blob[offsets[i]:offsets[i + 1]]).decode("utf-8", "surrogatepass")
+
+    # the parts of the file for a set of terms, as (count, nslots, offsets, slots, blob)
+    @staticmethod
+    def build(terms):
+        encoded = sorted({ _encode(term) for term in terms })
+        offsets = array("I", [0])
+        for key in encoded:
+            offsets.append(offsets[-1] + len(key))
+        nslots = 1
+        while nslots < 2 * len(encoded):
+            nslots *= 2
+        slots = array("I", bytes(4 * nslots))
+        mask = nslots - 1
+        for number, key in enumerate(encoded, start=1):
+            slot = zlib.crc32(key) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = number
+        return len(encoded), nslots, offsets.tobytes(), slots.tobytes(), b"".join(encoded)
+
+class TermDB:
+
+    # subjects:  terms from the LCSH
+    # childrens:  terms from the LC children's subject headings
+    # Either a TermTable (from load) or a frozenset (from from_lists)
+
+    def __init__(self, subjects, childrens, buf=None):
+        self.subjects = subjects
+        self.childrens = childrens
+        self._buf = buf
+
+    @classmethod
+    def from_lists(cls, subjectfile, childrensfile):
+        return cls(frozenset(read_terms(subjectfile)), frozenset(read_terms(childrensfile)))
+
+    def save(self, filename):
+        tables = [ TermTable.build(self.subjects), TermTable.build(self.childrens) ]
+        position = HEADER.size + len(tables) * TABLE_HEADER.size
+        headers = []
+        parts = []
+        for count, nslots, offsets, slots, blob in tables:
+            # offsets and slots first, so they stay 4-byte aligned for memoryview.cast
+            headers.append(TABLE_HEADER.pack(count, nslots, position, position + len(offsets),
+                                             position + len(offsets) + len(slots)))
+            parts += [ offsets, slots, blob, bytes(-len(blob) % 4) ]
+            position += len(offsets) + len(slots) + len(blob) + (-len(blob) % 4)
+        with open(filename, 'wb') as db:
+            db.write(HEADER.pack(MAGIC, TERMDB_VERSION, sys.byteorder.encode("ascii").ljust(8), len(tables)))
+            for part in headers + parts:
+                db.write(part)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as db:
+            buf = mmap.mmap(db.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, ntables = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != TERMDB_VERSION:
+            buf.close()
+            raise ValueError(f"{filename} is an old term database, please rebuild it with build-termdb.py")
+        if byteorder.rstrip() != sys.byteorder.encode("ascii"):
+            buf.close()
+            raise ValueError(f"{filename} was built on a computer with a different byte order, please rebuild it")
+        tables = [ TermTable(buf, *TABLE_HEADER.unpack_from(buf, HEADER.size + i * TABLE_HEADER.size))
+                   for i in range(ntables) ]
+        return cls(tables[0], tables[1], buf)
@@ -0,0 +1,78 @@
+#
+#    Load a MARC file into a database table in the per-field format that
+#    mydb.Table.readpymarc reads, i.e., one database row per MARC field.
+#
+#    Usage:  python marc-to-table.py --inputfile <MARC input file> --outputtable <database table>
+#               [ --schema <schema> ] [ --batchsize N ] [ --commitevery N ] [ --loaddata ]
+#
+#    The table should have columns for bibnumber, tag, indicator, and tagData.  tagData is all
+#    the subfields glommed together.  You can get more information from the mydb.py file.
+#
+#    The bibnumber of each record is taken from its 001 field, or the record number in the
+#    file (counting from 0) if there isn't a 001.
+#
+#    By default, rows are INSERTed batchsize rows at a time and committed every commitevery
+#    rows.  With --loaddata, rows are written to a temporary file and loaded with
+#    LOAD DATA LOCAL INFILE, which is faster, but your MySQL server has to allow it
+#    (local_infile=1).
+#
+#    Version:  0.1.0  10/18/26
+#
+#    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
+#
+#    Graeme Williams
+#    carryonwilliams@gmail.com
+#
+
+import argparse
+import os
+import tempfile
+
+from lib import mydb, mmapmarc, tagdata
+
+# all the rows for all the records in the file, one record at a time
+def marcrows(inputfile):
+    for index, aView in enumerate(mmapmarc.readviews(inputfile)):
+        field001 = aView['001']
+        bibnumber = field001.data.strip() if field001 else str(index)
+        yield from tagdata.record_rows(bibnumber, aView)
+
+def load_with_inserts(table, rows, batchsize, commitevery):
+    with table.bulkloader(batchsize, commitevery) as loader:
+        loader.addmany(rows)
+    return loader.total
+
+# write commitevery rows at a time to a temporary file and LOAD DATA it
+def load_with_loaddata(table, rows, commitevery):
+    total = 0
+    handle, loadfilename = tempfile.mkstemp(suffix=".tsv")
+    os.close(handle)
+    try:
+        while True:
+            with open(loadfilename, 'w', encoding='utf-8', newline='\n') as loadfile:
+                chunk = [ row for _, row in zip(range(commitevery), rows) ]
+                mydb.write_loadfile(chunk, loadfile)
+            if not chunk:
+                return total
+            total += table.loadfile(loadfilename)
+    finally:
+        os.remove(loadfilename)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a MARC file into a per-field database table.")
+    parser.add_argument("--inputfile", "-if", required=True)
+    parser.add_argument("--outputtable", "-ot", required=True)
+    parser.add_argument("--schema", default="world")
+    parser.add_argument("--batchsize", "-b", type=int, default=1000, help="rows per INSERT")
+    parser.add_argument("--commitevery", "-c", type=int, default=100000, help="rows per commit")
+    parser.add_argument("--loaddata", action="store_true", help="use LOAD DATA LOCAL INFILE")
+    args = parser.parse_args()
+
+    cnx = mydb.Connection(schema=args.schema, allow_local_infile=args.loaddata)
+    table = mydb.Table(cnx, args.outputtable)
+    rows = marcrows(args.inputfile)
+    if args.loaddata:
+        total = load_with_loaddata(table, rows, args.commitevery)
+    else:
+        total = load_with_inserts(table, rows, args.batchsize, args.commitevery)
+    print(f"Loaded {total} rows into {args.outputtable}")
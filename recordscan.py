@@ -2,15 +2,31 @@
 #    Scan a MARC file or database table and check for records that match specific tests
 #    Check for possible duplicate author names
 #
-#    Usage:  python recordscan.py --inputfile <MARC input file>
-#       or:  python recordscan.py --inputtable <database table>
+#    Usage:  python recordscan.py --inputfile <MARC input file> [ --lazy ] [ --workers N ] [ --authormemory MB ]
+#       or:  python recordscan.py --inputtable <database table> [ --batchsize N ]
+#
+#    With a MARC file, --results <file> remembers what the checks found for each record
+#    (by a hash of the record's bytes) and the next run only checks the records which are
+#    new or have changed.  The output is the same as checking every record.
+#
+#    Either way, --stats <JSON file> and --prometheus <textfile> write the number of
+#    calls, matches and time taken for each check, the records per second and the
+#    peak memory used.  With --results, the calls, matches and time per check only
+#    count the records which were actually checked, not the unchanged ones.
+#
+#    With a MARC file, --workers N splits the file into pieces and runs the checks
+#    in N processes.  The output is the same as running with one process.
+#
+#    The author names collected for the duplicate check are kept in memory until
+#    there are --authorlimit of them or they take up --authormemory MB, and then
+#    written to sorted temporary files which are merged at the end.
 #
 #    The database table should have columns for bibnumber, tag, indicators, and tagData.
 #    tagData is all the subfields glommed together.  You can get more information from
 #    the mydb.py file.
 #
 #
-#    Version:  0.2.0  1/26/25
+#    Version:  0.3.0  10/18/26
 #
 #    License:  CC BY-NC-SA 4.0, https://creativecommons.org/licenses/by-nc-sa/4.0/
 #
@@ -19,17 +35,29 @@
 #
 
 from collections import Counter
-import re
 import argparse
+import contextlib
+import importlib.metadata
+import io
+import multiprocessing
+import sys
+import time
 from pymarc import Record, Field
-from typing import Callable, Set, List, Tuple  # just used for type hints
+from typing import Callable, List, Tuple  # just used for type hints
 
-from lib import mymarc
+from lib import mymarc, mmapmarc, marcindex, authordups, fingerprint, runstats, resultstore
 
 # Globals!
 
 recordCounter : Counter = Counter()
-authorSet : Set[str] = set()
+# with --stats, the number of calls, matches and the time taken by each check:
+# (label, "calls"), (label, "matches") and (label, "seconds").  These only count
+# records which were checked, where recordCounter also counts the matches
+# remembered from an earlier run (see --results)
+checkStats : Counter = Counter()
+# the names harvested by collect_authors.  main replaces this with a store that has
+# the memory limits from the command line
+authorSet : authordups.AuthorStore = authordups.AuthorStore()
 
 # Utility functions
 
@@ -40,48 +68,32 @@ def to_string_simple(the_record : Record) -> str:
     part2 = the_record['245']['a'][:60] if the_record['245'] else "No 245"
     return part1 + '/' + part2
 
-# *** Next four functions are concerned with harvesting author data
+# *** The next two functions and lib/authordups.py are concerned with harvesting author data
 # *** from the $a and $d subfields of 100 and 700 fields so we
 # *** can check for possible duplicates (e.g., Smith, Bob ~ Smith, Bob, 1972-)
 
 # for each 100 and 700 field the $a and $d fields are jammed together; we split them later
-def collect_authors(arecord : Record):
+def record_authors(arecord : Record) -> List[str]:
+    authors = []
     afield : Field = arecord['100']
     if afield and afield['a']:
         aname = afield['a'].rstrip(",.") + ("#" + afield['d'].rstrip(",.") if afield['d'] else "")
-        authorSet.add(aname)
+        authors.append(aname)
     for f in arecord.get_fields('700'):
         if f['a']:
             aname = f['a'].rstrip(",.") + ("#" + f['d'].rstrip(",.") if f['d'] else "")
-            authorSet.add(aname)
-
-# split author string into name, birth date, death date, with missing values == None
-rgx = re.compile(r"(.*)(#\d{4}-)(\d{4}\.)?$")
-def author_split(author_string : str) -> Tuple:
-    m = rgx.match(author_string)
-    if not m:
-        return author_string, None, None
-    return m[1], m[2], m[3] if m.lastindex == 3 else None
-
-# When you're comparing two (name, birth date, death date) tuples, missing values match
-# anything, so only two non-None values can produce a False result
-def author_equals(x : str, y : str) -> bool:
-    for ax, ay in zip(author_split(x.casefold()), author_split(y.casefold())):
-        # ax and ay must be non-None to produce a false result
-        if ax and ay and ax != ay:
-            return False
-    return True
-
-# check for duplicate authors in global 'authorSet'
-# authorSet is sorted so possible duplicate pairs are consecutive
+            authors.append(aname)
+    return authors
+
+def collect_authors(arecord : Record):
+    authorSet.update(record_authors(arecord))
+
+# check for duplicate authors in global 'authorSet'.  Names are grouped into blocks
+# by name part, every pair in a block is compared (see lib/authordups.py), and each
+# group of possible duplicates comes back as one line:  A ~ B ~ C.  If the names
+# didn't fit in memory, the blocks are merged from the sorted runs on disk
 def check_for_duplicate_authors() -> List[str]:
-    result: List[str] = []
-    prev = "+++++"
-    for author in sorted(authorSet):
-        if author_equals(author, prev):
-            result.append(prev + " ~ " + author)
-        prev = author
-    return result
+    return [ " ~ ".join(cluster) for cluster in authordups.clusters(authorSet.blocks()) ]
 
 # *** Predicates that are too complicated to put into a lambda go here ***
 
@@ -92,7 +104,7 @@ def no1xx7xx(the_record : Record) -> bool:
 # yes, I know this is an odd test; it was an experiment
 def check245c1xx7xx(the_record : Record) -> bool:
     s = the_record['245']['c']
-    return s and ("and others" in s) and no1xx7xx(theRecord)
+    return s and ("and others" in s) and no1xx7xx(the_record)
 
 # return true if this record has a 6xx field with indicator 2 = 7 but no $2 subfield
 def indicator7butnodollar2(the_record : Record) -> bool:
@@ -100,24 +112,11 @@ def indicator7butnodollar2(the_record : Record) -> bool:
 
 # Return true if this record has duplicate 650 subject headings,
 # ignoring the trailing dot, if any.  The most common use case is
-# to detect duplicates if you use both LCSH and FAST
+# to detect duplicates if you use both LCSH and FAST.
+# Only $a, $b, $c, $d, $v, $x, $y and $z are compared (see fingerprint.subject_key)
 
 def duplicate_subjects(the_record : Record) -> bool:
-    # use only these fields in making the comparison
-    subfields650 = ('a', 'b', 'c', 'd', 'v', 'x', 'y', 'z')
-    field_list = []
-    subject_fields = the_record.get_fields('650')
-    if not subject_fields:
-        return False
-    # turn each 650 field into a dict and add it to field_list
-    for f in subject_fields:
-        field_dict = { k : f[k].rstrip('.') for k in subfields650 if f[k]}
-        field_list.append(field_dict)
-    # check the list for duplicate dicts
-    for i in range(0, len(field_list)):
-        if field_list[i] in field_list[i+1:]:
-            return True
-    return False
+    return fingerprint.has_duplicates(the_record.get_fields('650'), fingerprint.subject_key)
 
 # turn a predicate into a function to check the record
 # and count matching records, with optional print function
@@ -126,17 +125,39 @@ def checkfactory(label: str, predicate: Callable, print_this: Callable = None) -
 
     # this function is returned by checkFactory, with bound values of label, predicate and print_this
     # note that 'label' is being used both as the Counter key and to label output
+    # returns True if the record matched
     def check(record):
         if predicate(record):
             recordCounter[label] += 1
             if print_this:
                 print(label, ': ', print_this(record), sep='')
+            return True
+        return False
+
+    # the same, counting calls and time in checkStats.  main swaps this in for
+    # check with --stats, so when you're not counting it costs nothing
+    def timed_check(record):
+        start = time.perf_counter()
+        matched = check(record)
+        checkStats[label, "seconds"] += time.perf_counter() - start
+        checkStats[label, "calls"] += 1
+        checkStats[label, "matches"] += matched
+        return matched
 
     recordCounter[label] = 0
+    check.label = label
+    check.timed = timed_check
+    timed_check.label = label
+    timed_check.timed = timed_check
     return check
 
 # Construct list of checks from predicates.
 # This list is a list of *functions*
+#
+# The checks don't get the record itself but an index of its fields by tag (see
+# scan_record below), which answers r['245'], r.get_fields('650'), r.subjects()
+# and so on the same way, so a predicate can look up as many tags as it likes
+# without searching the record each time.
 
 checkList = (
 
@@ -178,30 +199,215 @@ checkList = (
                 )
 )
 
-parser = argparse.ArgumentParser()
-group = parser.add_mutually_exclusive_group(required=True)
-group.add_argument("--inputfile", "-if")
-group.add_argument("--inputtable", "-it")
-
-args = parser.parse_args()
-
-# For each MARC record in the file or database table:
-#   - collect authors from 100, 700;
-#   - run each check in the checkList
-for bibnum, theRecord in mymarc.recordgenerator(args.inputfile, args.inputtable):
-    collect_authors(theRecord)
+# The tags the checks and collect_authors look at.  Reading a database table, the
+# other fields aren't decoded at all (see mydb.Table.readpymarc).  If you add a
+# check which looks at another tag, add the tag here too
+CHECK_TAGS = ('001', '006', '041', '100', '110', '245', '546',
+              '700', '710', '711', '720', '730') + mmapmarc.SUBJECT_TAGS
+
+# Run every check on one record, and collect its authors.  The record's fields
+# are indexed by tag once (mymarc.indexed) and everything looks its fields up
+# in the index, so adding a check doesn't add another pass over the record
+def scan_record(the_record) -> None:
+    fields = mymarc.indexed(the_record)
+    collect_authors(fields)
     for c in checkList:
-        c(theRecord)
-
-# print number of records found for each check.
-# k is the label originally passed to checkfactory for each check
-print("\nSummary of record found in different categories")
-for k, n in recordCounter.items():
-    print(n, "records have", k)
-
-# print duplicate authors (e.g., Smith, Bob ~ Smith, Bob, 1972-)
-print("\nPossible duplicate NARs")
-print(*check_for_duplicate_authors(), sep="\n")
-
-# print(sorted(authorSet))
-
+        c(fields)
+
+# *** Incremental scans (--results):  what each record produced is remembered in a
+# *** result store (see lib/resultstore.py) keyed by a hash of the record's bytes, so
+# *** the next run only has to check records which are new or have changed
+
+# Check one record, as scan_record does, and return what's needed to produce the same
+# output without checking it again:  the labels of the checks it matched, what the
+# checks printed, and its authors.  The printing is left to the caller
+def check_record(the_record) -> Tuple:
+    fields = mymarc.indexed(the_record)
+    authors = record_authors(fields)
+    authorSet.update(authors)
+    with io.StringIO() as printed, contextlib.redirect_stdout(printed):
+        matched = tuple([ c.label for c in checkList if c(fields) ])
+        return matched, printed.getvalue(), authors
+
+# Scan records from a MARC file, reusing the results in store for the records we've
+# seen before.  Returns the number of records
+def scan_incremental(inputfile : str, lazy : bool, store : resultstore.ResultStore, start=0, end=None) -> int:
+    records = 0
+    for raw, view in mymarc.readrawfromfile(inputfile, start, end):
+        key = store.key(raw)
+        store.keep(key)
+        if (result := store.get(key)) is None:
+            result = check_record(mymarc.decode(view, lazy))
+            store.put(key, result)
+        else:
+            matched, _, authors = result
+            for label in matched:
+                recordCounter[label] += 1
+            authorSet.update(authors)
+        print(result[1], end='')
+        records += 1
+    return records
+
+# the signature of the results (see lib/resultstore.py):  if the checks change,
+# or the way records are read, the results have to be worked out again
+def results_signature(lazy : bool) -> str:
+    return resultstore.signature(__file__, mymarc.__file__, mmapmarc.__file__, fingerprint.__file__,
+                                 importlib.metadata.version("pymarc"), "lazy" if lazy else "pymarc")
+
+# Scan one byte range of a MARC file.  This runs in a worker process when
+# --workers is given, so instead of printing to the terminal, it captures
+# whatever the checks print and hands it back, along with the counts and
+# authors, for the parent process to merge.
+def scan_range(job : Tuple) -> Tuple:
+    inputfile, start, end, lazy, results, authorargs, counting = job
+    for k in recordCounter:
+        recordCounter[k] = 0
+    checkStats.clear()
+    # a worker started with spawn (the default on Windows and macOS) imports this
+    # module afresh, so it doesn't see main swap in the timed checks
+    global checkList
+    if counting:
+        checkList = tuple(c.timed for c in checkList)
+    # the worker's runs go in the main process's directory, which it cleans up
+    global authorSet
+    authorSet = authordups.AuthorStore(*authorargs)
+    records = 0
+    store = resultstore.ResultStore(results, results_signature(lazy), readonly=True) if results else None
+    with io.StringIO() as printed, contextlib.redirect_stdout(printed):
+        if store:
+            records = scan_incremental(inputfile, lazy, store, start, end)
+            store.close()
+        else:
+            for bibnum, theRecord in mymarc.readfromfile(inputfile, lazy, start, end):
+                scan_record(theRecord)
+                records += 1
+        return (Counter(recordCounter), printed.getvalue(), authorSet.take(), Counter(checkStats), records,
+                store.take() if store else None)
+
+# The statistics for --stats and --prometheus (see lib/runstats.py)
+def run_statistics(records : int, scan_seconds : float, duplicate_seconds : float, reused=None) -> dict:
+    peak, peak_children = runstats.peak_memory()
+    checks = []
+    for c in checkList:
+        checks.append({ "check" : c.label,
+                        "calls" : checkStats[c.label, "calls"],
+                        "matches" : checkStats[c.label, "matches"],
+                        "seconds" : checkStats[c.label, "seconds"],
+                        "matches_all_records" : recordCounter[c.label] })
+    # calls, matches and seconds are for the records which were checked
+    return { "records" : records,
+             "checked_records" : records - (reused or 0),
+             "scan_seconds" : scan_seconds,
+             "records_per_second" : records / scan_seconds if scan_seconds else None,
+             "duplicate_authors_seconds" : duplicate_seconds,
+             "peak_memory_bytes" : peak,
+             "peak_memory_workers_bytes" : peak_children,
+             "unchanged_records" : reused,
+             "checks" : sorted(checks, key=lambda check: check["seconds"], reverse=True) }
+
+def main():
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--inputfile", "-if")
+    group.add_argument("--inputtable", "-it")
+    parser.add_argument("--lazy", action="store_true",
+                        help="only decode the MARC fields the checks look at (MARC files only)")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="number of worker processes (MARC files only)")
+    parser.add_argument("--authorlimit", type=int, default=1000000,
+                        help="number of author names to keep in memory before writing them to disk")
+    parser.add_argument("--authormemory", type=int, default=None,
+                        help="megabytes of author names to keep in memory before writing them to disk")
+    parser.add_argument("--batchsize", "-b", type=int, default=None,
+                        help="stream table rows from the server in batches of this size (tables only)")
+    parser.add_argument("--results", default=None,
+                        help="remember the results for each record in this file and reuse them next time (MARC files only)")
+    parser.add_argument("--stats", default=None,
+                        help="write the time taken by each check, records/sec and peak memory to this JSON file")
+    parser.add_argument("--prometheus", default=None,
+                        help="write the same statistics to this Prometheus textfile")
+
+    args = parser.parse_args()
+
+    if args.results and not args.inputfile:
+        parser.error("--results only works with --inputfile")
+    # opening the store throws away results from a different version of the checks
+    store = resultstore.ResultStore(args.results, results_signature(args.lazy)) if args.results else None
+
+    global authorSet
+    authorSet = authordups.AuthorStore(args.authorlimit,
+                                       args.authormemory * 1024 * 1024 if args.authormemory else None)
+
+    # with statistics, every check counts its calls and time (see checkfactory)
+    global checkList
+    if (counting := args.stats or args.prometheus):
+        checkList = tuple(c.timed for c in checkList)
+    started = time.perf_counter()
+    records = 0
+
+    if args.workers > 1:
+        if not args.inputfile:
+            parser.error("--workers only works with --inputfile")
+        # more chunks than workers so a slow chunk doesn't hold everybody up;
+        # imap returns the results in file order, so the output is the same
+        # as a serial run
+        # if there's an up-to-date index (see Utilities/marc-index.py), each chunk
+        # gets the same number of records, otherwise the same number of bytes
+        if (index := marcindex.load_index(args.inputfile, build=False)):
+            ranges = index.ranges(args.workers * 4)
+        else:
+            ranges = mmapmarc.chunk_ranges(args.inputfile, args.workers * 4)
+        authorargs = (authorSet.max_names, authorSet.max_bytes, None, authorSet.rundir())
+        jobs = [ (args.inputfile, start, end, args.lazy, args.results, authorargs, bool(counting))
+                 for start, end in ranges ]
+        with multiprocessing.Pool(args.workers) as pool:
+            for counts, printed, authors, stats, n, results in pool.imap(scan_range, jobs):
+                recordCounter.update(counts)
+                print(printed, end='')
+                authorSet.merge(*authors)
+                checkStats.update(stats)
+                records += n
+                if results:
+                    store.merge(*results)
+    elif store:
+        records = scan_incremental(args.inputfile, args.lazy, store)
+    else:
+        # For each MARC record in the file or database table:
+        #   - collect authors from 100, 700;
+        #   - run each check in the checkList
+        for bibnum, theRecord in mymarc.recordgenerator(args.inputfile, args.inputtable,
+                                                          args.lazy, args.batchsize, CHECK_TAGS):
+            scan_record(theRecord)
+            records += 1
+
+    scanned = time.perf_counter()
+
+    # print number of records found for each check.
+    # k is the label originally passed to checkfactory for each check
+    print("\nSummary of record found in different categories")
+    for k, n in recordCounter.items():
+        print(n, "records have", k)
+
+    # print duplicate authors (e.g., Smith, Bob ~ Smith, Bob, 1972-)
+    print("\nPossible duplicate NARs")
+    duplicates = check_for_duplicate_authors()
+    authorSet.close()
+    finished = time.perf_counter()
+    print(*duplicates, sep="\n")
+
+    if counting:
+        stats = run_statistics(records, scanned - started, finished - scanned,
+                               store.stats['hits'] if store else None)
+        if args.stats:
+            runstats.write_json(stats, args.stats)
+        if args.prometheus:
+            runstats.write_prometheus(stats, args.prometheus, "recordscan")
+
+    # print(sorted(authorSet))
+
+    if store:
+        store.close(prune=True)
+        print(store.summary(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,16 @@
 #    tagData is all the subfields glommed together.  You can get more information from
 #    the mydb.py file in the lib folder.
 #
+#    With --isfdbindex, the ISFDB view is read into memory once instead of being queried
+#    for every record.  --isfdbindex <snapshot file> also saves the in-memory copy to a
+#    file (or reads it, if the file already exists), so later runs start quickly.  Use
+#    --rebuild to refresh the snapshot after you download a new copy of ISFDB.
+#
+#    The --limit argument (default 10000) stops the scan after that many records.
+#
+#    With --cache [ <cache file> ], responses from Goodreads and Novelist are kept in a
+#    cache file (default http-cache.sqlite), so a rerun doesn't ask for them again.
+#
 #    The --libcode argument is necessary in order to retrieve series data from Novelist.
 #    DO NOT include this unless you are a Bibliocommons library using your own
 #    library code.
@@ -23,11 +33,13 @@
 #    carryonwilliams@gmail.com
 #
 
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import argparse
+import os
 import requests
 
-from lib import mydb, mymarc, opac, goodreads
+from lib import mydb, mymarc, opac, goodreads, isfdb, httpcache
 
 parser = argparse.ArgumentParser(description=
     """Specify either an input file or a MySQL input table.
@@ -40,25 +52,72 @@ parser.add_argument("--libcode", "-lc", required=False)
 group = parser.add_mutually_exclusive_group(required=True)
 group.add_argument("--inputfile", "-if")
 group.add_argument("--inputtable", "-it")
+parser.add_argument("--isfdbindex", "-ix", nargs="?", const="", default=None,
+                    help="load the ISFDB view into memory once instead of querying for every record; "
+                         "if a snapshot file is given, read it (or create it if it doesn't exist)")
+parser.add_argument("--rebuild", action="store_true",
+                    help="rebuild the --isfdbindex snapshot file from the database")
+parser.add_argument("--limit", type=int, default=10000,
+                    help="stop after this many records (0 for no limit)")
+parser.add_argument("--cache", nargs="?", const=httpcache.DEFAULT_CACHEFILE, default=None,
+                    help="keep Goodreads and Novelist responses in this cache file between runs")
 
 args = parser.parse_args()
 
-therecordgenerator = mymarc.recordgenerator(args.inputfile, args.inputtable)
-check_cnx = mydb.Connection(schema="isfdb")
-check_table = mydb.Table(check_cnx, "author_title_series_name")
+# only the 100, 245 and 490 fields are looked at
+therecordgenerator = mymarc.recordgenerator(args.inputfile, args.inputtable, tags=('100', '245', '490'))
+
+# Either look up each author/title in the ISFDB view, or look it up in an
+# in-memory copy of the view (see lib/isfdb.py)
+series_index = None
+if args.isfdbindex is not None:
+    if args.isfdbindex and os.path.exists(args.isfdbindex) and not args.rebuild:
+        series_index = isfdb.SeriesIndex.load(args.isfdbindex)
+    else:
+        series_index = isfdb.SeriesIndex.from_table(
+            mydb.Table(mydb.Connection(schema="isfdb"), "author_title_series_name"))
+        if args.isfdbindex:
+            series_index.save(args.isfdbindex)
+else:
+    check_cnx = mydb.Connection(schema="isfdb")
+    check_table = mydb.Table(check_cnx, "author_title_series_name")
 
 # if you don't specify a library code, Novelist will not be checked
 libcode = args.libcode
 
+# Novelist and Goodreads lookups run in the background, so we carry on reading
+# records while they wait for their turn (see lib/ratelimit.py), and a Novelist
+# lookup doesn't wait for a Goodreads lookup or vice versa.  pending holds the
+# output lines in input order, with futures for the values we're waiting for.
+# Once WINDOW lines are waiting, we wait for the first one before reading on, so
+# a big catalog doesn't queue up a lookup for every record at once.
+
+WINDOW = 16
+
+def goodreads_series(session, author_name, title):
+    return goodreads.get_seriesname(session, goodreads.get_worknumber(session, author_name, title))
+
+# print the lines at the front of pending which are finished, waiting for the first
+# line until there are fewer than window lines left (so window=0 waits for them all)
+def print_finished(pending, window):
+    while pending and (len(pending) >= window or all(v.done() for v in pending[0] if isinstance(v, Future))):
+        line = pending.popleft()
+        print(*[ v.result() if isinstance(v, Future) else v for v in line ], sep = ',')
+
+lookups = ThreadPoolExecutor(max_workers=8)
+pending = deque()
+
 counts = Counter()
 session = requests.Session()
+if args.cache:
+    session = httpcache.CachedSession(httpcache.ResponseCache(args.cache), session)
 limit_counter = 0
 
 # For each MARC record in the file or database table:
 #   - collect authors from 100, 700;
 #   - run each check in the checkList
 for bibnum, theRecord in therecordgenerator:
-    if (limit_counter := limit_counter+1) > 10000:
+    if (limit_counter := limit_counter+1) > args.limit > 0:
         print("Hit limit from input table!")
         break
     if (field100 := theRecord['100']):
@@ -69,19 +128,22 @@ for bibnum, theRecord in therecordgenerator:
             # print(f"Encoding problem with {field100['a']} or {record['245']['a']}")
             counts['Character conversion failed'] += 1
             continue
-        query = (
-            f"WHERE author={mydb.dbescape(author_name)}"
-            f" AND title={mydb.dbescape(title)}"
-        )
-        try:
-            row = check_table.readfirstrow(query=query, debug=False)
-        except Exception:
-            # print(f"Problem with {author_name} and {title}")
-            counts['Query failed'] += 1
-            continue
-        
+        if series_index is not None:
+            row = series_index.row(author_name, title)
+        else:
+            query = (
+                f"WHERE author={mydb.dbescape(author_name)}"
+                f" AND title={mydb.dbescape(title)}"
+            )
+            try:
+                row = check_table.readfirstrow(query=query, debug=False)
+            except Exception:
+                # print(f"Problem with {author_name} and {title}")
+                counts['Query failed'] += 1
+                continue
+
         # At this point, we have the MARC record, from which we have extracted the title and author_name
-        # row has been returned from the local ISFDB instance, but might be None
+        # row has been returned from the local ISFDB instance (or the in-memory copy), but might be None
         # We're going to check whether the record has a 490 field and whether row is not None,
         # BUT we're not going to check that the series names match.
 
@@ -98,15 +160,22 @@ for bibnum, theRecord in therecordgenerator:
             isfdb_seriesname = row[2]
             # print(f"Missing 490 in {bibnum}: {title} (by) {author_name} = {isfdb_seriesname}")
             if bool(libcode) and bool(bibnum):
-                novelist_seriesname = opac.checkNoveListseries(session, libcode, bibnum, requestdelay=5)
+                novelist_seriesname = lookups.submit(opac.checkNoveListseries, session, libcode, bibnum, requestdelay=5)
             else:
                 novelist_seriesname = None
             if goodreads.enabled():
-                goodreads_seriesname = goodreads.get_seriesname(session, goodreads.get_worknumber(session, author_name, title))
+                goodreads_seriesname = lookups.submit(goodreads_series, session, author_name, title)
             else:
                 goodreads_seriesname = None
-            print(bibnum, author_name, title, isfdb_seriesname, novelist_seriesname, goodreads_seriesname, sep = ',')
+            pending.append([bibnum, author_name, title, isfdb_seriesname, novelist_seriesname, goodreads_seriesname])
+
+    print_finished(pending, WINDOW)
+
+print_finished(pending, 0)
+lookups.shutdown()
 
 print(counts)
+if args.cache:
+    print(session.cache.summary())
 
 session.close()